@@ -0,0 +1,20 @@
+-- Certificates formatted for display, computed once at ingest time
+-- "fire-safety.pdf|green_building.pdf" -> {"Fire Safety", "Green Building"}
+-- Also allows filtering: WHERE 'Green Building' = ANY(certificates_display)
+
+CREATE OR REPLACE FUNCTION format_certificates(raw TEXT)
+RETURNS TEXT[] AS $$
+    SELECT CASE
+        WHEN raw IS NULL OR lower(btrim(raw)) IN ('', 'nan') THEN NULL
+        ELSE ARRAY(
+            SELECT initcap(translate(replace(btrim(cert), '.pdf', ''), '-_', '  '))
+            FROM unnest(string_to_array(raw, '|')) WITH ORDINALITY AS c(cert, n)
+            ORDER BY n
+        )
+    END
+$$ LANGUAGE SQL IMMUTABLE;
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS certificates_display TEXT[];
+
+-- One-time backfill for rows loaded before this migration
+UPDATE properties SET certificates_display = format_certificates(certificates);
@@ -0,0 +1,16 @@
+-- Covering index for StructuredAgent searches
+-- Searches select only SEARCH_COLUMNS and ORDER BY price LIMIT n, so walking
+-- this index in price order answers them with an index-only scan (filters on
+-- location / num_rooms / size are checked against the included columns).
+-- location is filtered with ILIKE '%...%', which a leading btree key on
+-- location could not use, hence price as the key column.
+
+CREATE INDEX IF NOT EXISTS idx_search_covering
+    ON properties (price)
+    INCLUDE (property_id, location, num_rooms, property_size_sqft);
+
+-- Same key as idx_price from 001, which would only add write overhead now
+DROP INDEX IF EXISTS idx_price;
+
+-- Keep the visibility map current so index-only scans skip the heap
+VACUUM ANALYZE properties;
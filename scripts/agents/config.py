@@ -0,0 +1,52 @@
+"""
+Configuration - Environment Settings Loaded Once
+.env is parsed a single time per process instead of in every agent's __init__
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Config:
+    """Connection settings and API keys shared by all agents"""
+    db_host: str
+    db_port: int
+    db_name: str
+    db_user: str
+    db_password: Optional[str]
+    redis_host: str
+    redis_port: int
+    hf_token: Optional[str]
+    tavily_api_key: Optional[str]
+
+    @property
+    def db_config(self) -> dict:
+        """psycopg2 / asyncpg connection arguments (a new dict each call)"""
+        return {
+            'host': self.db_host,
+            'port': self.db_port,
+            'database': self.db_name,
+            'user': self.db_user,
+            'password': self.db_password
+        }
+
+
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    """Load .env and read the settings (first call only)"""
+    load_dotenv()
+    return Config(
+        db_host=os.getenv('DB_HOST', 'localhost'),
+        db_port=int(os.getenv('DB_PORT', 5432)),
+        db_name=os.getenv('DB_NAME', 'realestate'),
+        db_user=os.getenv('DB_USER', 'postgres'),
+        db_password=os.getenv('DB_PASSWORD'),
+        redis_host=os.getenv('REDIS_HOST', 'localhost'),
+        redis_port=int(os.getenv('REDIS_PORT', 6379)),
+        hf_token=os.getenv('HF_TOKEN'),
+        tavily_api_key=os.getenv('TAVILY_API_KEY')
+    )
@@ -0,0 +1,187 @@
+"""
+Database Helpers - Shared PostgreSQL and Redis Connections
+Agents borrow pooled connections instead of connecting on every query
+"""
+
+import os
+import json
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+
+try:
+    import redis
+    from redis import RedisError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+    class RedisError(Exception):
+        """Stand-in so callers can catch Redis errors without redis installed"""
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+
+# (dumps, loads) pairs for values stored in Redis.
+# default=str keeps values like listing_date datetimes serializable.
+JSON_SERIALIZER = (
+    lambda value: json.dumps(value, default=str),
+    json.loads
+)
+MSGPACK_SERIALIZER = (
+    lambda value: msgpack.packb(value, use_bin_type=True, default=str),
+    lambda raw: msgpack.unpackb(raw, raw=False)
+) if MSGPACK_AVAILABLE else None
+
+
+class _BlockingPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that keeps returned connections open and waits for a free one
+
+    psycopg2 closes any returned connection beyond minconn and raises
+    PoolError when all maxconn are out. Connections are still opened
+    lazily, but up to maxconn stay open once made, and getconn() blocks
+    until another caller returns one.
+    """
+
+    def __init__(self, maxconn: int, **kwargs):
+        super().__init__(1, maxconn, **kwargs)
+        self.minconn = maxconn  # _putconn keeps up to minconn idle connections
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+# One pool per distinct db_config, shared by every agent in the process
+_PG_POOLS = {}
+_pool_lock = threading.Lock()
+
+
+def _pool_key(db_config: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in db_config.items()))
+
+
+def get_pool(db_config: dict) -> _BlockingPool:
+    """Get (or lazily create) the connection pool for a database config"""
+    key = _pool_key(db_config)
+    pool = _PG_POOLS.get(key)
+    if pool is None:
+        with _pool_lock:
+            pool = _PG_POOLS.get(key)
+            if pool is None:
+                pool = _BlockingPool(
+                    maxconn=int(os.getenv('PG_POOL_SIZE', 10)),
+                    **db_config
+                )
+                _PG_POOLS[key] = pool
+    return pool
+
+
+@contextmanager
+def connection(db_config: dict):
+    """
+    Borrow a pooled connection, waiting while all PG_POOL_SIZE are in use
+
+    The connection goes back to the pool on exit; any transaction left
+    open (e.g. after a plain SELECT or an error) is rolled back by the pool.
+    """
+    pool = get_pool(db_config)
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+# asyncpg pools belong to the event loop that created them
+_ASYNC_PG_POOLS = weakref.WeakKeyDictionary()
+
+
+async def get_async_pool(db_config: dict):
+    """Get (or lazily create) the asyncpg pool for a database config on the running loop"""
+    if not ASYNCPG_AVAILABLE:
+        raise ImportError("Async database access requires asyncpg")
+
+    pools = _ASYNC_PG_POOLS.setdefault(asyncio.get_running_loop(), {})
+    key = _pool_key(db_config)
+    if key not in pools:
+        # Store the creation task so concurrent callers await the same pool
+        pools[key] = asyncio.ensure_future(asyncpg.create_pool(
+            **db_config,
+            min_size=1,
+            max_size=int(os.getenv('PG_POOL_SIZE', 10))
+        ))
+    try:
+        return await pools[key]
+    except Exception:
+        pools.pop(key, None)  # Retry pool creation on the next call
+        raise
+
+
+# One Redis client per (host, port). A failed connect is remembered only
+# for REDIS_RETRY_INTERVAL seconds, so Redis coming up later is picked up
+# without restarting the process.
+REDIS_RETRY_INTERVAL = 30
+_REDIS_CLIENTS = {}
+_REDIS_FAILED_AT = {}
+_redis_lock = threading.Lock()
+
+
+def _redis_backing_off(key: tuple) -> bool:
+    failed_at = _REDIS_FAILED_AT.get(key)
+    return failed_at is not None and time.monotonic() - failed_at < REDIS_RETRY_INTERVAL
+
+
+def get_redis_client(host: str, port: int):
+    """Shared Redis client for host/port, or None if Redis is unavailable"""
+    key = (host, port)
+    client = _REDIS_CLIENTS.get(key)
+    if client is not None or not REDIS_AVAILABLE or _redis_backing_off(key):
+        return client
+
+    with _redis_lock:
+        client = _REDIS_CLIENTS.get(key)
+        if client is None and not _redis_backing_off(key):
+            try:
+                pool = redis.ConnectionPool(
+                    host=host,
+                    port=port,
+                    decode_responses=False,
+                    max_connections=int(os.getenv('REDIS_POOL_SIZE', 32)),
+                    socket_keepalive=True,
+                    health_check_interval=30
+                )
+                client = redis.Redis(connection_pool=pool)
+                client.ping()  # Test connection once per process
+                _REDIS_CLIENTS[key] = client
+                _REDIS_FAILED_AT.pop(key, None)
+            except Exception:
+                client = None
+                _REDIS_FAILED_AT[key] = time.monotonic()
+
+    return client
@@ -0,0 +1,76 @@
+"""
+HTTP Helpers - Shared Keep-Alive Session
+Agents reuse TCP/TLS connections to HuggingFace and Tavily instead of
+reconnecting on every request
+"""
+
+import asyncio
+import threading
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+_SESSION = None
+_session_lock = threading.Lock()
+
+# Async clients belong to the event loop that created them
+_ASYNC_CLIENTS = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide requests.Session with pooled connections and retries on connect failures and 5xx gateway errors"""
+    global _SESSION
+    if _SESSION is None:
+        with _session_lock:
+            if _SESSION is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=32,
+                    # Read timeouts are not retried: the provider may still be
+                    # working on (and billing for) the first request
+                    max_retries=Retry(total=3, connect=3, read=0, other=0,
+                                      backoff_factor=0.3,
+                                      status_forcelist=(502, 503, 504),
+                                      allowed_methods=frozenset({"POST"}))
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """
+    Shared httpx.AsyncClient for the running event loop
+
+    Lets async code (FastAPI handlers) overlap HTTP calls without blocking
+    the loop; HTTP/2 is used when the h2 package is installed.
+    """
+    if not HTTPX_AVAILABLE:
+        raise ImportError("Async HTTP requires httpx")
+
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=32)
+        )
+        _ASYNC_CLIENTS[loop] = client
+    return client
@@ -5,54 +5,105 @@ Memory Component - Three Types of Memory
 3. Long-term Memory: User preferences (PostgreSQL)
 """
 
+import io
 import os
-import json
-import psycopg2
+import csv
+import asyncio
+import threading
+import time
+import weakref
 from datetime import datetime
-from dotenv import load_dotenv
+from psycopg2.extras import execute_batch
+from .db import (
+    connection, get_async_pool, get_redis_client, JSON_SERIALIZER, MSGPACK_SERIALIZER,
+    REDIS_RETRY_INTERVAL
+)
+from .config import get_config
 
 try:
-    import redis
-    REDIS_AVAILABLE = True
+    import redis.asyncio as aioredis
+    import asyncpg
+    ASYNC_AVAILABLE = True
 except ImportError:
-    REDIS_AVAILABLE = False
+    ASYNC_AVAILABLE = False
+
+
+# Long-term memory table (from Phase 1 migrations)
+_USER_MEMORY_DDL = """
+    CREATE TABLE IF NOT EXISTS user_memory (
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR(100) NOT NULL,
+        memory_key VARCHAR(100) NOT NULL,
+        memory_value TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, memory_key)
+    )
+"""
+
+# Upsert shared by single and batched preference writes
+_UPSERT_PREFERENCE_SQL = """
+    INSERT INTO user_memory (user_id, memory_key, memory_value)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (user_id, memory_key)
+    DO UPDATE SET memory_value = EXCLUDED.memory_value, updated_at = CURRENT_TIMESTAMP
+"""
+
+# Above this many rows, stream through COPY instead of batched INSERTs
+_COPY_THRESHOLD = 1024
 
 
 class Memory:
     """Manages three types of memory for the chatbot"""
 
-    def __init__(self, user_id: str):
-        load_dotenv()
+    # Databases whose user_memory table is known to exist (shared by all sessions)
+    _schema_ready = set()
+    _lock = threading.Lock()
+
+    def __init__(self, user_id: str, use_msgpack: bool = True):
+        config = get_config()
         self.user_id = user_id
 
         # 1. Episodic Memory: In-memory conversation history
         self.episodic = []
 
         # 2. Short-term Memory: Redis cache for session
-        if REDIS_AVAILABLE:
-            try:
-                self.redis_client = redis.Redis(
-                    host=os.getenv('REDIS_HOST', 'localhost'),
-                    port=int(os.getenv('REDIS_PORT', 6379)),
-                    decode_responses=True
-                )
-                self.redis_client.ping()  # Test connection
-                self.redis_available = True
-            except:
-                self.redis_available = False
-                self.shortterm = {}  # Fallback to dict
+        self.redis_host = config.redis_host
+        self.redis_port = config.redis_port
+        self.shortterm = {}  # Fallback while Redis is unreachable
+
+        # msgpack is smaller and faster than JSON; JSON stays readable for debugging
+        if use_msgpack and MSGPACK_SERIALIZER:
+            self._serializer = MSGPACK_SERIALIZER
         else:
-            self.redis_available = False
-            self.shortterm = {}
+            self._serializer = JSON_SERIALIZER
 
         # 3. Long-term Memory: PostgreSQL
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', 5432),
-            'database': os.getenv('DB_NAME', 'realestate'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD')
-        }
+        self.db_config = config.db_config
+
+    @property
+    def redis_client(self):
+        """Shared Redis client, or None while Redis is unreachable (re-checked periodically)"""
+        return get_redis_client(self.redis_host, self.redis_port)
+
+    @property
+    def redis_available(self) -> bool:
+        return self.redis_client is not None
+
+    @classmethod
+    def _ensure_schema(cls, db_config: dict):
+        """Create the user_memory table (from Phase 1 migrations) once per database"""
+        key = (db_config.get('host'), str(db_config.get('port')), db_config.get('database'))
+        if key in cls._schema_ready:
+            return
+
+        with cls._lock:
+            if key in cls._schema_ready:
+                return
+            with connection(db_config) as conn, conn.cursor() as cursor:
+                cursor.execute(_USER_MEMORY_DDL)
+                conn.commit()
+            cls._schema_ready.add(key)
 
     # ============ EPISODIC MEMORY ============
     def add_message(self, role: str, content: str):
@@ -78,8 +129,10 @@ class Memory:
         """Store session context (expires after ttl seconds)"""
         full_key = f"session:{self.user_id}:{key}"
 
-        if self.redis_available:
-            self.redis_client.setex(full_key, ttl, json.dumps(value))
+        client = self.redis_client
+        if client is not None:
+            dumps, _ = self._serializer
+            client.setex(full_key, ttl, dumps(value))
         else:
             self.shortterm[full_key] = value
 
@@ -87,81 +140,264 @@ class Memory:
         """Retrieve session context"""
         full_key = f"session:{self.user_id}:{key}"
 
-        if self.redis_available:
-            value = self.redis_client.get(full_key)
-            return json.loads(value) if value else None
+        client = self.redis_client
+        if client is not None:
+            _, loads = self._serializer
+            raw = client.get(full_key)
+            return loads(raw) if raw else None
         else:
             return self.shortterm.get(full_key)
 
     def clear_session(self):
         """Clear all session data"""
-        if self.redis_available:
+        client = self.redis_client
+        if client is not None:
+            # SCAN walks the keyspace incrementally instead of blocking Redis
+            # like KEYS. UNLINK frees memory in a background thread, unlike
+            # DEL, and pipelining sends each batch in one round-trip.
             pattern = f"session:{self.user_id}:*"
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
+            pipe = client.pipeline(transaction=False)
+            count = 0
+            for key in client.scan_iter(match=pattern, count=500):
+                pipe.unlink(key)
+                count += 1
+                if count % 500 == 0:
+                    pipe.execute()
+            pipe.execute()
         else:
             self.shortterm = {}
 
     # ============ LONG-TERM MEMORY (PostgreSQL) ============
     def save_preference(self, key: str, value: str):
         """Save user preference to database (persistent)"""
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+        self._ensure_schema(self.db_config)
+
+        with connection(self.db_config) as conn, conn.cursor() as cursor:
+            # Insert or update
+            cursor.execute(_UPSERT_PREFERENCE_SQL, (self.user_id, key, value))
+            conn.commit()
+
+    def save_preferences(self, items: dict):
+        """Save several user preferences in one round-trip (or one COPY for bulk loads)"""
+        if not items:
+            return
+
+        self._ensure_schema(self.db_config)
+        rows = [(self.user_id, key, value) for key, value in items.items()]
+
+        with connection(self.db_config) as conn, conn.cursor() as cursor:
+            if len(rows) > _COPY_THRESHOLD:
+                self._copy_preferences(cursor, rows)
+            else:
+                execute_batch(cursor, _UPSERT_PREFERENCE_SQL, rows, page_size=200)
+            conn.commit()
+
+    def _copy_preferences(self, cursor, rows: list):
+        """COPY rows into a staging table, then upsert them in a single statement"""
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        buf.seek(0)
 
-        # Check if user_memory table exists (from Phase 1 migrations)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_memory (
-                id SERIAL PRIMARY KEY,
-                user_id VARCHAR(100) NOT NULL,
-                memory_key VARCHAR(100) NOT NULL,
-                memory_value TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, memory_key)
-            )
+            CREATE TEMP TABLE user_memory_stage (
+                user_id VARCHAR(100),
+                memory_key VARCHAR(100),
+                memory_value TEXT
+            ) ON COMMIT DROP
         """)
-
-        # Insert or update
+        cursor.copy_expert(
+            "COPY user_memory_stage (user_id, memory_key, memory_value) FROM STDIN WITH CSV",
+            buf
+        )
         cursor.execute("""
             INSERT INTO user_memory (user_id, memory_key, memory_value)
-            VALUES (%s, %s, %s)
+            SELECT user_id, memory_key, memory_value FROM user_memory_stage
             ON CONFLICT (user_id, memory_key)
             DO UPDATE SET memory_value = EXCLUDED.memory_value, updated_at = CURRENT_TIMESTAMP
-        """, (self.user_id, key, value))
-
-        conn.commit()
-        cursor.close()
-        conn.close()
+        """)
 
     def get_preference(self, key: str):
         """Retrieve user preference from database"""
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT memory_value FROM user_memory
-            WHERE user_id = %s AND memory_key = %s
-        """, (self.user_id, key))
-
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with connection(self.db_config) as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT memory_value FROM user_memory
+                WHERE user_id = %s AND memory_key = %s
+            """, (self.user_id, key))
+            result = cursor.fetchone()
 
         return result[0] if result else None
 
     def get_all_preferences(self) -> dict:
         """Get all user preferences"""
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+        with connection(self.db_config) as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT memory_key, memory_value FROM user_memory
+                WHERE user_id = %s
+            """, (self.user_id,))
+            results = cursor.fetchall()
 
-        cursor.execute("""
-            SELECT memory_key, memory_value FROM user_memory
-            WHERE user_id = %s
-        """, (self.user_id,))
+        return {row[0]: row[1] for row in results}
 
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
 
-        return {row[0]: row[1] for row in results}
+class AsyncMemory:
+    """
+    Async variant of Memory (asyncpg + redis.asyncio)
+
+    Mirrors the Memory API with awaitable short-term and long-term methods,
+    so async endpoints can gather history, preferences and context
+    concurrently instead of blocking the event loop.
+    """
+
+    # Redis clients belong to the event loop that created them
+    _redis_clients = weakref.WeakKeyDictionary()
+    _schema_ready = set()
+
+    # Episodic memory is in-process either way
+    add_message = Memory.add_message
+    get_conversation_history = Memory.get_conversation_history
+    clear_conversation = Memory.clear_conversation
+
+    def __init__(self, user_id: str, use_msgpack: bool = True):
+        if not ASYNC_AVAILABLE:
+            raise ImportError("AsyncMemory requires asyncpg and redis>=4.2")
+
+        config = get_config()
+        self.user_id = user_id
+        self.episodic = []
+        self.shortterm = {}  # Fallback when Redis is unreachable
+
+        if use_msgpack and MSGPACK_SERIALIZER:
+            self._serializer = MSGPACK_SERIALIZER
+        else:
+            self._serializer = JSON_SERIALIZER
+
+        self.redis_host = config.redis_host
+        self.redis_port = config.redis_port
+
+        self.db_config = config.db_config
+
+    async def _redis(self):
+        """Shared async Redis client for this event loop, or None if unavailable"""
+        clients = self._redis_clients.setdefault(asyncio.get_running_loop(), {})
+        key = (self.redis_host, self.redis_port)
+
+        # (ping task, start time); a failed ping is retried after REDIS_RETRY_INTERVAL
+        entry = clients.get(key)
+        if entry is not None:
+            task, started = entry
+            retry = (task.done() and task.result() is None
+                     and time.monotonic() - started >= REDIS_RETRY_INTERVAL)
+            if not retry:
+                return await task
+
+        client = aioredis.Redis(connection_pool=aioredis.ConnectionPool(
+            host=self.redis_host,
+            port=self.redis_port,
+            max_connections=int(os.getenv('REDIS_POOL_SIZE', 32)),
+            socket_keepalive=True,
+            health_check_interval=30
+        ))
+        task = asyncio.ensure_future(self._ping(client))
+        clients[key] = (task, time.monotonic())
+        return await task
+
+    @staticmethod
+    async def _ping(client):
+        try:
+            await client.ping()
+            return client
+        except Exception:
+            return None
+
+    async def _pg(self):
+        """Shared asyncpg pool for this event loop (user_memory ensured once)"""
+        pool = await get_async_pool(self.db_config)
+
+        key = tuple(sorted((k, str(v)) for k, v in self.db_config.items()))
+        if key not in self._schema_ready:
+            async with pool.acquire() as conn:
+                await conn.execute(_USER_MEMORY_DDL)
+            self._schema_ready.add(key)
+
+        return pool
+
+    # ============ SHORT-TERM MEMORY (Redis) ============
+    async def set_context(self, key: str, value, ttl: int = 3600):
+        """Store session context (expires after ttl seconds)"""
+        full_key = f"session:{self.user_id}:{key}"
+        client = await self._redis()
+
+        if client is not None:
+            dumps, _ = self._serializer
+            await client.setex(full_key, ttl, dumps(value))
+        else:
+            self.shortterm[full_key] = value
+
+    async def get_context(self, key: str):
+        """Retrieve session context"""
+        full_key = f"session:{self.user_id}:{key}"
+        client = await self._redis()
+
+        if client is not None:
+            _, loads = self._serializer
+            raw = await client.get(full_key)
+            return loads(raw) if raw else None
+        else:
+            return self.shortterm.get(full_key)
+
+    async def clear_session(self):
+        """Clear all session data (SCAN + pipelined UNLINK, as in Memory)"""
+        client = await self._redis()
+
+        if client is not None:
+            pattern = f"session:{self.user_id}:*"
+            pipe = client.pipeline(transaction=False)
+            count = 0
+            async for key in client.scan_iter(match=pattern, count=500):
+                pipe.unlink(key)
+                count += 1
+                if count % 500 == 0:
+                    await pipe.execute()
+            await pipe.execute()
+        else:
+            self.shortterm = {}
+
+    # ============ LONG-TERM MEMORY (PostgreSQL) ============
+    async def save_preference(self, key: str, value: str):
+        """Save user preference to database (persistent)"""
+        await self.save_preferences({key: value})
+
+    async def save_preferences(self, items: dict):
+        """Save several user preferences in one pipelined batch"""
+        if not items:
+            return
+
+        pool = await self._pg()
+        rows = [(self.user_id, key, value) for key, value in items.items()]
+        async with pool.acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO user_memory (user_id, memory_key, memory_value)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (user_id, memory_key)
+                DO UPDATE SET memory_value = EXCLUDED.memory_value, updated_at = CURRENT_TIMESTAMP
+            """, rows)
+
+    async def get_preference(self, key: str):
+        """Retrieve user preference from database"""
+        pool = await self._pg()
+        async with pool.acquire() as conn:
+            return await conn.fetchval("""
+                SELECT memory_value FROM user_memory
+                WHERE user_id = $1 AND memory_key = $2
+            """, self.user_id, key)
+
+    async def get_all_preferences(self) -> dict:
+        """Get all user preferences"""
+        pool = await self._pg()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT memory_key, memory_value FROM user_memory
+                WHERE user_id = $1
+            """, self.user_id)
+
+        return {row['memory_key']: row['memory_value'] for row in rows}
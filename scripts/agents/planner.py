@@ -4,15 +4,18 @@ Handles both simple (single agent) and complex (multi-agent) queries
 """
 
 from typing import List, Dict, Tuple
-from dotenv import load_dotenv
+
+
+# Agents that read another agent's output from the same turn
+# (generate_report uses the results of search_property)
+TASK_DEPENDENCIES = {
+    'generate_report': {'search_property'},
+}
 
 
 class Planner:
     """Orchestrates agent execution based on query complexity"""
 
-    def __init__(self):
-        load_dotenv()
-
     def plan(self, query_type: str, intents: List[str], slots: Dict) -> List[Dict]:
         """
         Create execution plan based on query complexity
@@ -24,9 +27,9 @@ class Planner:
             
         Returns: List of task dictionaries to execute in order
         Example: [
-            {"agent": "search_property", "params": {"location": "Mumbai", "num_rooms": 2}},
-            {"agent": "estimate_renovation", "params": {"property_size_sqft": 1200}},
-            {"agent": "generate_report", "params": {}}
+            {"agent": "search_property", "params": {"location": "Mumbai", "num_rooms": 2}, "group": 0},
+            {"agent": "estimate_renovation", "params": {"property_size_sqft": 1200}, "group": 0},
+            {"agent": "generate_report", "params": {}, "group": 1}
         ]
         """
         
@@ -69,18 +72,28 @@ class Planner:
             intents: Ordered list of intents to execute
             slots: All extracted parameters
             
-        Returns: Multiple tasks with their parameters
+        Returns: Multiple tasks with their parameters and a "group" number.
+            Tasks in the same group are independent and can run concurrently;
+            groups run in ascending order.
         """
         if not intents:
-            return [{"agent": "general_query", "params": {}}]
+            return [{"agent": "general_query", "params": {}, "group": 0}]
         
         tasks = []
         
         for intent in intents:
             params = self._extract_relevant_params(intent, slots)
-            tasks.append({"agent": intent, "params": params})
+            tasks.append({"agent": intent, "params": params, "group": self._group_for(intent, tasks)})
         
         return tasks
+
+    def _group_for(self, intent: str, planned: List[Dict]) -> int:
+        """Run after every earlier task this intent depends on (else in group 0)"""
+        depends_on = TASK_DEPENDENCIES.get(intent, set())
+        return max(
+            (task['group'] + 1 for task in planned if task['agent'] in depends_on),
+            default=0
+        )
     
     def _extract_relevant_params(self, intent: str, slots: Dict) -> Dict:
         """
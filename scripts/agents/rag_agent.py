@@ -4,50 +4,195 @@ Semantic search + LLM for answering questions about properties
 """
 
 import os
+import json
+import hashlib
+import threading
+from datetime import datetime
 import faiss
 import numpy as np
-import requests
-import psycopg2
 from sentence_transformers import SentenceTransformer
-from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+from .db import (
+    connection, get_redis_client, RedisError, JSON_SERIALIZER, MSGPACK_SERIALIZER
+)
+from .http_client import get_http_session
+from .config import get_config
+
+
+# Sentence-transformers model for property and query embeddings (ETL uses it too)
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Redis cache lifetimes (seconds) for LLM answers and property rows
+LLM_CACHE_TTL = 3600
+PROPERTY_CACHE_TTL = 3600
+
+# Context line per retrieved property, and certificate file name cleanup
+# ("fire-safety.pdf" -> "Fire Safety")
+_PROP_FMT = (
+    "Property {property_id}: {title} in {location}. Price: Rs.{price:,}. "
+    "Rooms: {num_rooms}. Size: {size} sqft."
+).format_map
+_CERT_TT = str.maketrans({"-": " ", "_": " "})
+
+# TIMESTAMP columns of properties; cached rows hold them as strings
+_DATETIME_COLUMNS = ('listing_date', 'created_at')
+
+# Read-only retrieval assets shared by every RAGAgent in the process.
+# The index and its ID map are swapped together, so they live in one tuple.
+_shared_lock = threading.Lock()
+_MODEL = None
+_INDEX = None  # (faiss index, id_map)
+
+
+def _faiss_dir() -> str:
+    # Determine project root (go up from scripts/agents/ to root)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(current_dir, '..', '..')
+    return os.path.join(project_root, 'data', 'faiss_index')
+
+
+def _load_model() -> SentenceTransformer:
+    """
+    Build the embedding model, optionally pinned to a device or backend
+
+    EMBEDDING_DEVICE pins inference (e.g. "cpu", "cuda"); by default
+    sentence-transformers picks CUDA when available. EMBEDDING_BACKEND=onnx
+    with EMBEDDING_MODEL_FILE (e.g. "onnx/model_qint8_avx512.onnx") runs
+    the int8-quantized ONNX export for faster CPU inference.
+    """
+    kwargs = {'device': os.getenv('EMBEDDING_DEVICE') or None}
+
+    backend = os.getenv('EMBEDDING_BACKEND', 'torch')
+    if backend != 'torch':
+        kwargs['backend'] = backend
+        if os.getenv('EMBEDDING_MODEL_FILE'):
+            kwargs['model_kwargs'] = {'file_name': os.getenv('EMBEDDING_MODEL_FILE')}
+
+    return SentenceTransformer(EMBEDDING_MODEL, **kwargs)
+
+
+def _get_model() -> SentenceTransformer:
+    """Load the embedding model (same as Phase 1) once per process"""
+    global _MODEL
+    if _MODEL is None:
+        with _shared_lock:
+            if _MODEL is None:
+                _MODEL = _load_model()
+    return _MODEL
+
+
+def _get_index() -> tuple:
+    """Load the FAISS index and its ID mapping once per process"""
+    global _INDEX
+    shared = _INDEX
+    if shared is None:
+        with _shared_lock:
+            if _INDEX is None:
+                faiss_dir = _faiss_dir()
+
+                # Load FAISS index
+                index = _read_index(os.path.join(faiss_dir, 'properties.index'))
+                _set_nprobe(index, int(os.getenv('FAISS_NPROBE') or _index_meta(faiss_dir).get('nprobe') or 8))
+
+                # Load ID mapping
+                with open(os.path.join(faiss_dir, 'id_map.txt'), 'r') as f:
+                    id_map = [line.strip() for line in f]
+
+                _INDEX = (index, id_map)
+            shared = _INDEX
+    return shared
+
+
+def _read_index(path: str):
+    """
+    Memory-map the index read-only where FAISS supports it
+
+    Pages are faulted in as searches touch them, and every API worker
+    process shares the same physical pages. Index types that cannot be
+    mapped (e.g. flat or scalar-quantized) are read into memory as before.
+    """
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def _index_meta(faiss_dir: str) -> dict:
+    """Build settings written by ETL step 4 (empty for older indexes)"""
+    try:
+        with open(os.path.join(faiss_dir, 'index_meta.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _set_nprobe(index, nprobe: int):
+    """Set how many IVF cells a search visits (no-op for exhaustive indexes)"""
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+
+
+def clear_property_cache():
+    """Drop cached property rows (after ETL re-ingests the catalog)"""
+    config = get_config()
+    cache = get_redis_client(config.redis_host, config.redis_port)
+    if cache is None:
+        return
+
+    try:
+        pipe = cache.pipeline(transaction=False)
+        for key in cache.scan_iter(match="prop:*", count=500):
+            pipe.unlink(key)
+        pipe.execute()
+    except RedisError as e:
+        # Stale rows then expire after PROPERTY_CACHE_TTL
+        print(f"[RAG] Could not clear property cache: {e}")
+
+
+def _get_shared() -> tuple:
+    """(embedding_model, index, id_map) shared across RAGAgent instances"""
+    index, id_map = _get_index()
+    return _get_model(), index, id_map
+
+
+def reset_shared_index():
+    """Drop the cached FAISS index so new agents load the re-built one (after ETL)"""
+    global _INDEX
+    with _shared_lock:
+        _INDEX = None
 
 
 class RAGAgent:
     """Retrieves relevant properties and generates answers with LLM"""
 
     def __init__(self):
-        load_dotenv()
-
-        # Load embedding model (same as Phase 1)
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
-        # Determine project root (go up from scripts/agents/ to root)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.join(current_dir, '..', '..')
-        faiss_dir = os.path.join(project_root, 'data', 'faiss_index')
+        config = get_config()
 
-        # Load FAISS index
-        index_path = os.path.join(faiss_dir, 'properties.index')
-        self.index = faiss.read_index(index_path)
-
-        # Load ID mapping
-        id_map_path = os.path.join(faiss_dir, 'id_map.txt')
-        with open(id_map_path, 'r') as f:
-            self.id_map = [line.strip() for line in f]
+        # Embedding model and FAISS index are loaded once and shared
+        self.embedding_model, self.index, self.id_map = _get_shared()
 
         # Database config
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', 5432),
-            'database': os.getenv('DB_NAME', 'realestate'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD')
-        }
+        self.db_config = config.db_config
+
+        # Redis for LLM answers and property rows (see the cache property)
+        self._redis_address = (config.redis_host, config.redis_port)
+        self._dumps, self._loads = MSGPACK_SERIALIZER or JSON_SERIALIZER
 
         # LLM config
-        self.hf_token = os.getenv('HF_TOKEN')
+        self.hf_token = config.hf_token
         self.model = "meta-llama/Llama-3.2-3B-Instruct:novita"
         self.api_url = "https://router.huggingface.co/v1/chat/completions"
+        self._auth_headers = {
+            "Authorization": f"Bearer {self.hf_token}",
+        }
+        self._session = get_http_session()
+
+    @property
+    def cache(self):
+        """Shared Redis client, or None while Redis is unreachable (re-checked periodically)"""
+        return get_redis_client(*self._redis_address)
 
     def answer(self, question: str, top_k: int = 3, certificate_keywords: str = None) -> dict:
         """
@@ -66,18 +211,7 @@ class RAGAgent:
         """
 
         # Step 1: Enhance query if certificate keywords provided
-        search_query = question
-        if certificate_keywords:
-            # If user asked about certificates, emphasize it in search
-            if certificate_keywords.lower() in ['certificate', 'certification', 'certified']:
-                # Generic certificate query - search for any certificate content
-                search_query = f"{question} certificate certification safety building"
-            else:
-                # Specific certificate type - emphasize it
-                search_query = f"{question} {certificate_keywords}"
-
-            print(f"[RAG] Certificate search - Keywords: '{certificate_keywords}'")
-            print(f"[RAG] Enhanced query: '{search_query}'")
+        search_query = self._search_query(question, certificate_keywords)
 
         # Step 2: Retrieve relevant properties
         properties = self._retrieve(search_query, top_k)
@@ -93,58 +227,121 @@ class RAGAgent:
             "sources": sources
         }
 
+    def _search_query(self, question: str, certificate_keywords: str = None) -> str:
+        """Enhance the search query with certificate keywords, if any"""
+        if not certificate_keywords:
+            return question
+
+        # If user asked about certificates, emphasize it in search
+        if certificate_keywords.lower() in ['certificate', 'certification', 'certified']:
+            # Generic certificate query - search for any certificate content
+            search_query = f"{question} certificate certification safety building"
+        else:
+            # Specific certificate type - emphasize it
+            search_query = f"{question} {certificate_keywords}"
+
+        print(f"[RAG] Certificate search - Keywords: '{certificate_keywords}'")
+        print(f"[RAG] Enhanced query: '{search_query}'")
+        return search_query
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        """Embed texts in one batched forward pass as unit-norm float32 vectors"""
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.astype('float32', copy=False)
+
     def _retrieve(self, query: str, top_k: int) -> list:
         """Search FAISS for relevant properties"""
+        return self._retrieve_many([query], top_k)[0]
 
-        # Create query embedding
-        query_embedding = self.embedding_model.encode(query)
-        query_vector = np.array([query_embedding], dtype='float32')
-        faiss.normalize_L2(query_vector)
-
-        # Search FAISS
-        distances, indices = self.index.search(query_vector, top_k)
+    def _retrieve_many(self, queries: list, top_k: int) -> list:
+        """Search FAISS for several queries at once; one property list per query"""
 
-        # Get property IDs
-        property_ids = [self.id_map[idx] for idx in indices[0]]
+        # Create query embeddings (already normalized, so no normalize_L2 pass)
+        query_vectors = self._encode_batch(queries)
 
-        # Fetch full property details from DB
-        properties = self._fetch_properties(property_ids)
+        # Search FAISS
+        distances, indices = self.index.search(query_vectors, top_k)
 
-        return properties
+        # Get property IDs (-1 marks an empty slot when fewer than top_k
+        # vectors were reachable) and fetch full property details from DB
+        return [
+            self._fetch_properties([self.id_map[idx] for idx in row if idx >= 0])
+            for row in indices
+        ]
 
     def _fetch_properties(self, property_ids: list) -> list:
-        """Get property details from database"""
-
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
-
-        placeholders = ','.join(['%s'] * len(property_ids))
-        query = f"SELECT * FROM properties WHERE property_id IN ({placeholders})"
-
-        cursor.execute(query, property_ids)
-        columns = [desc[0] for desc in cursor.description]
-        results = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
-
-        # Convert to dicts
-        properties = []
-        for row in results:
-            properties.append(dict(zip(columns, row)))
-
-        return properties
+        """Get property details, from the Redis cache where possible"""
+
+        if not property_ids:
+            return []
+
+        found = {}
+        cache = self.cache
+        if cache is not None:
+            try:
+                cached = cache.mget([f"prop:{pid}" for pid in property_ids])
+            except RedisError:
+                cached = []  # Redis is optional; fall back to Postgres
+            for pid, raw in zip(property_ids, cached):
+                if raw:
+                    found[pid] = self._load_property(raw)
+
+        missing = [pid for pid in property_ids if pid not in found]
+        if missing:
+            loaded = self._query_properties(missing)
+            found.update(loaded)
+
+            if cache is not None and loaded:
+                pipe = cache.pipeline(transaction=False)
+                for pid, prop in loaded.items():
+                    pipe.setex(f"prop:{pid}", PROPERTY_CACHE_TTL, self._dumps(prop))
+                try:
+                    pipe.execute()
+                except RedisError:
+                    pass
+
+        # Return rows in FAISS rank order rather than DB order
+        return [found[pid] for pid in property_ids if pid in found]
+
+    def _load_property(self, raw: bytes) -> dict:
+        """Decode a cached row, restoring the datetimes the serializer stored as str()"""
+        prop = self._loads(raw)
+        for column in _DATETIME_COLUMNS:
+            value = prop.get(column)
+            if isinstance(value, str):
+                prop[column] = datetime.fromisoformat(value)
+        return prop
+
+    def _query_properties(self, property_ids: list) -> dict:
+        """Load properties from the database, keyed by property_id"""
+
+        # One array parameter keeps the statement text identical for any K
+        query = "SELECT * FROM properties WHERE property_id = ANY(%s)"
+
+        # RealDictCursor builds the row dicts in psycopg2, no zip() per row
+        with connection(self.db_config) as conn, \
+                conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, (list(property_ids),))
+            return {row['property_id']: row for row in cursor.fetchall()}
 
     def _generate(self, question: str, properties: list, certificate_keywords: str = None) -> str:
         """Generate answer using LLM with context"""
+        prompt = self._build_prompt(question, properties, certificate_keywords)
 
-        # Build context from properties
-        context = self._build_context(properties)
-
-        # Create prompt with certificate-specific instructions if needed
-        certificate_instruction = ""
-        if certificate_keywords:
-            certificate_instruction = f"""
+        # Call LLM
+        return self._call_llm(prompt)
+
+    @staticmethod
+    def _certificate_instruction(certificate_keywords: str = None) -> str:
+        """Extra prompt instructions for certificate queries"""
+        if not certificate_keywords:
+            return ""
+        return f"""
 CERTIFICATE QUERY DETECTED:
 - The user is asking about: {certificate_keywords}
 - Each property listing below includes certificates (if any)
@@ -152,6 +349,15 @@ CERTIFICATE QUERY DETECTED:
 - If no certificates match, say so clearly
 """
 
+    def _build_prompt(self, question: str, properties: list, certificate_keywords: str = None) -> str:
+        """Create the LLM prompt from the retrieved properties"""
+
+        # Build context from properties
+        context = self._build_context(properties)
+
+        # Create prompt with certificate-specific instructions if needed
+        certificate_instruction = self._certificate_instruction(certificate_keywords)
+
         prompt = f"""You are a helpful real estate assistant. Answer the question based ONLY on the provided
         property information below. Use the EXACT data provided - do not estimate, assume, or infer information.
 {certificate_instruction}
@@ -169,43 +375,78 @@ IMPORTANT:
 
 Answer:"""
 
-        # Call LLM
-        response = self._call_llm(prompt)
-
-        return response
+        return prompt
 
     def _build_context(self, properties: list) -> str:
         """Build context string from properties"""
-
-        context_parts = []
-        for prop in properties:
-            # Build basic property info
-            prop_info = (
-                f"Property {prop['property_id']}: "
-                f"{prop.get('title_short_description', 'N/A')} in {prop.get('location', 'N/A')}. "
-                f"Price: Rs.{prop.get('price', 0):,}. "
-                f"Rooms: {prop.get('num_rooms', 'N/A')}. "
-                f"Size: {prop.get('property_size_sqft', 'N/A')} sqft."
-            )
-
-            # Add certificate information if available
-            certificates = prop.get('certificates', '')
+        return '\n'.join(self._describe_property(prop) for prop in properties)
+
+    def _describe_property(self, prop: dict) -> str:
+        """One context line per property, with certificates if available"""
+        prop_info = _PROP_FMT({
+            'property_id': prop['property_id'],
+            'title': prop.get('title_short_description', 'N/A'),
+            'location': prop.get('location', 'N/A'),
+            'price': prop.get('price', 0),
+            'num_rooms': prop.get('num_rooms', 'N/A'),
+            'size': prop.get('property_size_sqft', 'N/A')
+        })
+
+        # Add certificate information if available (pre-formatted at ingest,
+        # see migrations/002; raw column kept as fallback for older rows)
+        cert_names = prop.get('certificates_display')
+        if cert_names:
+            prop_info += f" Certificates: {', '.join(cert_names)}."
+        else:
+            certificates = prop.get('certificates')
             if certificates and str(certificates).lower() != 'nan':
-                cert_list = [c.strip() for c in str(certificates).split('|')]
-                cert_names = [c.replace('.pdf', '').replace('-', ' ').title() for c in cert_list]
-                prop_info += f" Certificates: {', '.join(cert_names)}."
+                cert_names = ', '.join(
+                    c.strip().replace('.pdf', '').translate(_CERT_TT).title()
+                    for c in str(certificates).split('|')
+                )
+                prop_info += f" Certificates: {cert_names}."
+
+        return prop_info
+
+    def _call_llm(self, prompt: str, max_tokens: int = 300) -> str:
+        """Call HuggingFace API, reusing a cached answer for an identical prompt"""
+        cache_key = self._llm_cache_key(prompt, max_tokens)
+
+        cache = self.cache
+        if cache is not None:
+            try:
+                raw = cache.get(cache_key)
+            except RedisError:
+                raw = None  # Redis is optional; ask the LLM instead
+            if raw:
+                return self._loads(raw)
+
+        content = self._request_completion(prompt, max_tokens)
+
+        if cache is not None:
+            try:
+                cache.setex(cache_key, LLM_CACHE_TTL, self._dumps(content))
+            except RedisError:
+                pass
 
-            context_parts.append(prop_info)
+        return content
 
-        return '\n'.join(context_parts)
+    def _llm_cache_key(self, prompt: str, max_tokens: int = 300) -> str:
+        return "llm:" + hashlib.sha256(f"{self.model}\n{max_tokens}\n{prompt}".encode()).hexdigest()
 
-    def _call_llm(self, prompt: str) -> str:
+    def _request_completion(self, prompt: str, max_tokens: int = 300) -> str:
         """Call HuggingFace API using chat completions endpoint"""
-        headers = {
-            "Authorization": f"Bearer {self.hf_token}",
-        }
+        payload = self._completion_payload(prompt, max_tokens)
+
+        response = self._session.post(self.api_url, headers=self._auth_headers, json=payload, timeout=30)
+        response.raise_for_status()
+
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
 
-        payload = {
+    def _completion_payload(self, prompt: str, max_tokens: int = 300) -> dict:
+        """Chat completions request body for a single-turn prompt"""
+        return {
             "messages": [
                 {
                     "role": "user",
@@ -213,12 +454,6 @@ Answer:"""
                 }
             ],
             "model": self.model,
-            "max_tokens": 300,
+            "max_tokens": max_tokens,
             "temperature": 0.7
         }
-
-        response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
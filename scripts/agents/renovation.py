@@ -3,10 +3,15 @@ Renovation Estimator - Cost Calculation
 Estimates renovation costs based on property size and rooms
 """
 
+from .structured_agent import _parse_amount, _parse_count
+
 
 class RenovationEstimator:
     """Calculates renovation cost estimates"""
 
+    # Rough size (sqft) by number of rooms: 1 BHK ~600 ... 4 BHK ~1800
+    _SIZE_TABLE = (0, 600, 1000, 1400, 1800)
+
     def __init__(self):
         # Cost per sqft for different renovation types (in INR)
         self.rates = {
@@ -27,6 +32,10 @@ class RenovationEstimator:
             Dictionary with cost estimates
         """
 
+        # LLM slots may carry numbers as strings ("1200", "3 BHK")
+        if property_size_sqft is not None:
+            property_size_sqft = _parse_amount(property_size_sqft)
+
         # Estimate size if not provided
         if property_size_sqft is None and num_rooms:
             property_size_sqft = self._estimate_size(num_rooms)
@@ -57,15 +66,15 @@ class RenovationEstimator:
         return costs
 
     def _estimate_size(self, num_rooms: int) -> int:
-        """Estimate property size from number of rooms"""
-        # Rough estimates
-        size_map = {
-            1: 600,   # 1 BHK ~600 sqft
-            2: 1000,  # 2 BHK ~1000 sqft
-            3: 1400,  # 3 BHK ~1400 sqft
-            4: 1800,  # 4 BHK ~1800 sqft
-        }
-        return size_map.get(num_rooms, num_rooms * 450)
+        """Estimate property size from number of rooms (None if the count can't be read)"""
+        # LLM slots may carry the count as a float (2.0) or a string ("3 BHK")
+        rooms = _parse_count(num_rooms)
+        if not rooms:
+            return None
+
+        if rooms < len(self._SIZE_TABLE):
+            return self._SIZE_TABLE[rooms]
+        return rooms * 450
 
     def format_estimate(self, costs: dict) -> str:
         """Format costs as readable text"""
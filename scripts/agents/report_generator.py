@@ -4,11 +4,92 @@ Creates comparison reports for properties
 """
 
 import os
-import matplotlib.pyplot as plt
+import uuid
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Headless backend, skips GUI backend probing
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_pdf import PdfPages
 from datetime import datetime
 
 
+# Bar charts have few vertices; simplify paths as aggressively as possible
+matplotlib.rcParams['path.simplify_threshold'] = 1.0
+
+# Worker processes for rendering reports off the request thread (created on first use).
+# Spawned rather than forked: the API process holds model/FAISS threads and
+# open DB/Redis sockets that a forked child must not inherit.
+_EXEC = None
+_exec_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _EXEC
+    if _EXEC is None:
+        with _exec_lock:
+            if _EXEC is None:
+                _EXEC = ProcessPoolExecutor(
+                    max_workers=min(os.cpu_count() or 1, 4),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _EXEC
+
+
+# Report columns, converted from the property dicts once per report
+_REPORT_DTYPE = [
+    ('id', 'U32'),
+    ('location', 'U20'),  # Fixed width truncates long names for the table
+    ('price', 'f8'),
+    ('rooms', 'i8'),
+    ('size', 'i8'),
+]
+
+
+def _to_report_array(properties: list) -> np.ndarray:
+    """Pack the fields the charts and table need into a structured array"""
+    return np.array([
+        (
+            p['property_id'],
+            p.get('location') or 'N/A',
+            p.get('price') or 0,
+            p.get('num_rooms') or 0,
+            p.get('property_size_sqft') or 0
+        )
+        for p in properties
+    ], dtype=_REPORT_DTYPE)
+
+
+def _render_pdf(filename: str, properties: list) -> str:
+    """Render the report pages into filename (runs in-process or in a worker)"""
+    data = _to_report_array(properties)
+
+    # One figure is reused for every page instead of building one per page
+    fig = Figure()
+
+    with PdfPages(filename) as pdf:
+        # Page 1: Price Comparison
+        fig.set_size_inches(10, 6)
+        ReportGenerator._create_price_chart(fig, data)
+        pdf.savefig(fig)
+        fig.clear()
+
+        # Page 2: Size Comparison
+        ReportGenerator._create_size_chart(fig, data)
+        pdf.savefig(fig)
+        fig.clear()
+
+        # Page 3: Property Details Table
+        fig.set_size_inches(11, 8)
+        ReportGenerator._create_details_page(fig, data)
+        pdf.savefig(fig)
+
+    return filename
+
+
 class ReportGenerator:
     """Generates PDF reports with property comparisons"""
 
@@ -34,79 +115,78 @@ class ReportGenerator:
         if not properties:
             return None
 
-        # Generate filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{self.output_dir}/property_report_{timestamp}.pdf"
-
         # Create PDF
-        with PdfPages(filename) as pdf:
-            # Page 1: Price Comparison
-            self._create_price_chart(properties)
-            pdf.savefig()
-            plt.close()
-
-            # Page 2: Size Comparison
-            self._create_size_chart(properties)
-            pdf.savefig()
-            plt.close()
-
-            # Page 3: Property Details Table
-            self._create_details_page(properties)
-            pdf.savefig()
-            plt.close()
+        filename = _render_pdf(self._new_filename(), properties)
 
         print(f"Report generated: {filename}")
         return filename
 
-    def _create_price_chart(self, properties: list):
-        """Create price comparison bar chart"""
+    async def generate_report_async(self, properties: list, report_type: str = 'comparison') -> str:
+        """
+        Generate PDF report in a worker process without blocking the event loop
 
-        fig, ax = plt.subplots(figsize=(10, 6))
+        Same arguments and return value as generate_report
+        """
 
-        property_ids = [p['property_id'] for p in properties]
-        prices = [p['price'] / 100000 for p in properties]  # Convert to lakhs
+        if not properties:
+            return None
+
+        loop = asyncio.get_running_loop()
+        filename = await loop.run_in_executor(
+            _get_executor(), _render_pdf, self._new_filename(), list(properties)
+        )
+
+        print(f"Report generated: {filename}")
+        return filename
 
-        ax.barh(property_ids, prices, color='skyblue')
+    def _new_filename(self) -> str:
+        """Generate filename (unique suffix, reports can render concurrently)"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"{self.output_dir}/property_report_{timestamp}_{uuid.uuid4().hex[:8]}.pdf"
+
+    @staticmethod
+    def _create_price_chart(fig: Figure, data: np.ndarray):
+        """Create price comparison bar chart"""
+
+        ax = fig.add_subplot(111)
+
+        ax.barh(data['id'], data['price'] / 100000, color='skyblue')  # Convert to lakhs
         ax.set_xlabel('Price (Lakhs)', fontsize=12)
         ax.set_title('Property Price Comparison', fontsize=14, fontweight='bold')
         ax.grid(axis='x', alpha=0.3)
 
-        plt.tight_layout()
+        fig.tight_layout()
 
-    def _create_size_chart(self, properties: list):
+    @staticmethod
+    def _create_size_chart(fig: Figure, data: np.ndarray):
         """Create size comparison chart"""
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-
-        property_ids = [p['property_id'] for p in properties]
-        sizes = [p.get('property_size_sqft', 0) for p in properties]
+        ax = fig.add_subplot(111)
 
-        ax.barh(property_ids, sizes, color='lightgreen')
+        ax.barh(data['id'], data['size'], color='lightgreen')
         ax.set_xlabel('Size (sqft)', fontsize=12)
         ax.set_title('Property Size Comparison', fontsize=14, fontweight='bold')
         ax.grid(axis='x', alpha=0.3)
 
-        plt.tight_layout()
+        fig.tight_layout()
 
-    def _create_details_page(self, properties: list):
+    @staticmethod
+    def _create_details_page(fig: Figure, data: np.ndarray):
         """Create property details table"""
 
-        fig, ax = plt.subplots(figsize=(11, 8))
+        ax = fig.add_subplot(111)
         ax.axis('tight')
         ax.axis('off')
 
-        # Prepare table data
+        # Prepare table data (column-wise formatting, prices in lakhs)
         headers = ['Property ID', 'Location', 'Price (Lakhs)', 'Rooms', 'Size (sqft)']
-        table_data = []
-
-        for prop in properties:
-            table_data.append([
-                prop['property_id'],
-                prop.get('location', 'N/A')[:20],  # Truncate long names
-                f"{prop['price'] / 100000:.2f}",
-                prop.get('num_rooms', 'N/A'),
-                prop.get('property_size_sqft', 'N/A')
-            ])
+        table_data = np.column_stack([
+            data['id'],
+            data['location'],
+            np.char.mod('%.2f', data['price'] / 100000),
+            data['rooms'].astype(str),
+            data['size'].astype(str)
+        ]).tolist()
 
         # Create table
         table = ax.table(
@@ -126,4 +206,4 @@ class ReportGenerator:
             table[(0, i)].set_facecolor('#4CAF50')
             table[(0, i)].set_text_props(weight='bold', color='white')
 
-        plt.title('Property Details', fontsize=16, fontweight='bold', pad=20)
+        ax.set_title('Property Details', fontsize=16, fontweight='bold', pad=20)
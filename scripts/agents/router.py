@@ -4,57 +4,96 @@ Detects if query is simple (single agent) or complex (multiple agents)
 """
 
 import os
+import re
 import json
-import requests
-from typing import Dict, Tuple, List
-from dotenv import load_dotenv
-
-
-class QueryRouter:
-    """Routes user queries and detects complexity for planner"""
-
-    def __init__(self):
-        load_dotenv()
-        self.hf_token = os.getenv('HF_TOKEN')
-        self.model = "meta-llama/Llama-3.2-3B-Instruct:novita"
-        self.api_url = "https://router.huggingface.co/v1/chat/completions"
-
-    def route(self, user_input: str) -> Tuple[str, List[str], Dict]:
-        """
-        Main routing function - detects complexity and extracts intents
-        
-        Returns: (query_type, intents_list, slots)
-            query_type: "simple-query" or "complex-query" or "out_of_scope"
-            intents_list: List of intents to execute in order
-            slots: Extracted parameters
-        """
-        # Build the prompt
-        prompt = self._build_prompt(user_input)
-
-        # Call LLM
-        llm_response = self._call_llm(prompt)
-
-        # Parse JSON response
-        result = self._extract_json(llm_response)
-
-        # Determine query type and return appropriate structure
-        if not result['in_scope']:
-            return 'out_of_scope', [], {}
-        
-        intents = result.get('intents', [])
-        slots = result.get('slots', {})
-        
-        # Determine if simple or complex based on number of intents
-        if len(intents) == 1:
-            return 'simple-query', intents, slots
-        else:
-            return 'complex-query', intents, slots
-
-    def _build_prompt(self, user_query: str) -> str:
-        """Create the routing prompt for complexity detection and intent extraction"""
-        return f"""You are a real estate query analyzer. Analyze the query and return ONLY valid JSON (no other text).
-
-Query: {user_query}
+import asyncio
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Dict, Tuple, List, Optional
+from .http_client import get_http_session, get_async_http_client, HTTPX_AVAILABLE
+from .config import get_config
+
+# Faster JSON parsing / validation of LLM output (optional)
+try:
+    import orjson
+    _json_loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import fastjsonschema
+    FASTJSONSCHEMA_AVAILABLE = True
+except ImportError:
+    FASTJSONSCHEMA_AVAILABLE = False
+
+
+# Parsed routes keyed by normalized query text, shared by every router in
+# the process. LLM parses of the same text don't change, so entries are
+# only ever evicted (least recently used first), never invalidated.
+ROUTE_CACHE_SIZE = 1024
+_ROUTE_CACHE = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Optional near-duplicate lookup: embeddings of cached queries, row-aligned
+# with _SEMANTIC_KEYS. Off unless ROUTER_SEMANTIC_CACHE=1, since queries that
+# differ only in a number ("2BHK" vs "3BHK") can embed very closely.
+_SEMANTIC_KEYS = []
+_SEMANTIC_VECS = None
+
+# Fast path for the common single-intent phrasings in the routing prompt
+# examples. Patterns are anchored to the whole query, so anything with
+# extra clauses ("... and save my preference") still goes to the LLM.
+_WORD = r"(?!(?:and|or|with|then|also|under|below|within|near|for)\b)[a-z][a-z.]*"
+_PLACE = r"(" + _WORD + r"(?:\s+" + _WORD + r"){0,2})"  # up to 3 words
+_FAST_SEARCH = re.compile(
+    r"^(?:find|show(?:\s+me)?|search(?:\s+for)?|list)\s+(?:an?\s+)?(\d+)\s*bhks?"
+    r"(?:\s+(?:properties|property|flats?|apartments?|homes?|houses?))?"
+    r"(?:\s+in\s+" + _PLACE + r")?"
+    r"(?:\s+(?:under|below|within)\s+(?:rs\.?\s*)?([\d.]+)\s*(lakhs?|lacs?|crores?|cr|l)?)?"
+    r"\s*[.?!]?$",
+    re.IGNORECASE
+)
+_FAST_RENOVATION = re.compile(
+    r"^estimate\s+(?:the\s+)?renovation(?:\s+costs?)?\s+for\s+(?:an?\s+)?(\d+)\s*"
+    r"(?:sq\.?\s*ft|sqft|square\s+feet)\s*[.?!]?$",
+    re.IGNORECASE
+)
+_FAST_RESEARCH = re.compile(
+    r"^what\s+(?:are|is)\s+(?:the\s+)?(?:current\s+)?(?:market\s+rates?|price\s+trends?)"
+    r"\s+in\s+" + _PLACE + r"\s*[.?!]?$",
+    re.IGNORECASE
+)
+_PRICE_UNITS = {'l': 100000, 'lakh': 100000, 'lac': 100000, 'cr': 10000000, 'crore': 10000000}
+
+ALLOWED_INTENTS = (
+    'search_property', 'estimate_renovation', 'generate_report',
+    'save_preference', 'web_research', 'general_query'
+)
+_ALLOWED_INTENT_SET = frozenset(ALLOWED_INTENTS)
+
+# Shape of an already-clean routing result; replies that match skip the
+# field-by-field repair in _validate_and_clean
+ROUTE_SCHEMA = {
+    "type": "object",
+    "required": ["in_scope", "intents", "slots"],
+    "properties": {
+        "in_scope": {"type": "boolean"},
+        "intents": {
+            "type": "array",
+            "minItems": 1,
+            "uniqueItems": True,
+            "items": {"enum": list(ALLOWED_INTENTS)}
+        },
+        "slots": {"type": "object"}
+    }
+}
+_validate_route = fastjsonschema.compile(ROUTE_SCHEMA) if FASTJSONSCHEMA_AVAILABLE else None
+
+# Routing prompt, built once. All static instructions and examples come
+# first and the user query last, so every request shares a byte-identical
+# prefix that provider-side prompt caches can reuse.
+_ROUTER_PROMPT_PREFIX = """You are a real estate query analyzer. Analyze the query and return ONLY valid JSON (no other text).
 
 Your task:
 1. Determine if query is real estate related (in_scope: true/false)
@@ -69,17 +108,17 @@ IMPORTANT RULES:
 - Choose ONLY from: [search_property, estimate_renovation, generate_report, save_preference, web_research, general_query]
 
 JSON structure:
-{{
+{
   "in_scope": boolean,
   "intents": [intent1, intent2, ...],
-  "slots": {{
+  "slots": {
     "location": string or null,
     "num_rooms": number or null,
     "max_price": number or null,
     "property_size_sqft": number or null,
     "certificate_keywords": string or null
-  }}
-}}
+  }
+}
 
 IMPORTANT for certificate_keywords:
 - Extract if query mentions: "certificate", "certified", "certification", "green building", "fire safety", "pest control", "structural safety"
@@ -89,38 +128,321 @@ IMPORTANT for certificate_keywords:
 Examples:
 
 Query: "Find 2BHK in Mumbai under 50 lakh"
-{{"in_scope": true, "intents": ["search_property"], "slots": {{"location": "Mumbai", "num_rooms": 2, "max_price": 5000000, "property_size_sqft": null, "certificate_keywords": null}}}}
+{"in_scope": true, "intents": ["search_property"], "slots": {"location": "Mumbai", "num_rooms": 2, "max_price": 5000000, "property_size_sqft": null, "certificate_keywords": null}}
 
 Query: "Show me properties with green building certification"
-{{"in_scope": true, "intents": ["general_query"], "slots": {{"location": null, "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": "green building"}}}}
+{"in_scope": true, "intents": ["general_query"], "slots": {"location": null, "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": "green building"}}
 
 Query: "Find fire safety certified properties in Bangalore"
-{{"in_scope": true, "intents": ["general_query"], "slots": {{"location": "Bangalore", "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": "fire safety"}}}}
+{"in_scope": true, "intents": ["general_query"], "slots": {"location": "Bangalore", "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": "fire safety"}}
 
 Query: "Find 3BHK properties in Bangalore, estimate renovation cost, and generate a comparison report"
-{{"in_scope": true, "intents": ["search_property", "estimate_renovation", "generate_report"], "slots": {{"location": "Bangalore", "num_rooms": 3, "max_price": null, "property_size_sqft": null, "certificate_keywords": null}}}}
+{"in_scope": true, "intents": ["search_property", "estimate_renovation", "generate_report"], "slots": {"location": "Bangalore", "num_rooms": 3, "max_price": null, "property_size_sqft": null, "certificate_keywords": null}}
 
 Query: "Show me properties under 1 crore and save my budget preference"
-{{"in_scope": true, "intents": ["search_property", "save_preference"], "slots": {{"location": null, "num_rooms": null, "max_price": 10000000, "property_size_sqft": null, "certificate_keywords": null}}}}
+{"in_scope": true, "intents": ["search_property", "save_preference"], "slots": {"location": null, "num_rooms": null, "max_price": 10000000, "property_size_sqft": null, "certificate_keywords": null}}
 
 Query: "What are current market rates in Delhi?"
-{{"in_scope": true, "intents": ["web_research"], "slots": {{"location": "Delhi", "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": null}}}}
+{"in_scope": true, "intents": ["web_research"], "slots": {"location": "Delhi", "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": null}}
 
 Query: "Estimate renovation for 1200 sqft"
-{{"in_scope": true, "intents": ["estimate_renovation"], "slots": {{"location": null, "num_rooms": null, "max_price": null, "property_size_sqft": 1200, "certificate_keywords": null}}}}
+{"in_scope": true, "intents": ["estimate_renovation"], "slots": {"location": null, "num_rooms": null, "max_price": null, "property_size_sqft": 1200, "certificate_keywords": null}}
 
 Query: "Who is the president?"
-{{"in_scope": false, "intents": [], "slots": {{"location": null, "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": null}}}}
+{"in_scope": false, "intents": [], "slots": {"location": null, "num_rooms": null, "max_price": null, "property_size_sqft": null, "certificate_keywords": null}}
 
-Now analyze this query and return ONLY the JSON:"""
+Now analyze this query and return ONLY the JSON.
 
-    def _call_llm(self, prompt: str) -> str:
-        """Call HuggingFace API using chat completions endpoint"""
-        headers = {
+Query: \""""
+_ROUTER_PROMPT_SUFFIX = '"\n'
+
+
+# Server-sent events: one "data: {json}" line per chunk, then "data: [DONE]"
+_SSE_DONE = object()
+
+
+def _sse_content(line):
+    """Text delta of one streamed chat-completions line (bytes or str), or _SSE_DONE"""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    if not line.startswith("data: "):
+        return None
+    data = line[6:]
+    if data.strip() == "[DONE]":
+        return _SSE_DONE
+    choices = _json_loads(data).get("choices")
+    return choices[0].get("delta", {}).get("content") if choices else None
+
+
+class _JsonEndScanner:
+    """Finds where the first top-level JSON object ends in streamed text"""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, chunk: str) -> Optional[int]:
+        """Index just past the closing brace if it is in this chunk, else None"""
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.depth > 0
+            elif ch == '{':
+                self.depth += 1
+            elif ch == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return None
+
+
+class QueryRouter:
+    """Routes user queries and detects complexity for planner"""
+
+    def __init__(self):
+        self.hf_token = get_config().hf_token
+        self.model = "meta-llama/Llama-3.2-3B-Instruct:novita"
+        self.api_url = "https://router.huggingface.co/v1/chat/completions"
+        self._auth_headers = {
             "Authorization": f"Bearer {self.hf_token}",
         }
+        self._session = get_http_session()
+        self.semantic_cache = os.getenv('ROUTER_SEMANTIC_CACHE', '0') == '1'
+        self.semantic_threshold = float(os.getenv('ROUTER_SEMANTIC_THRESHOLD', 0.95))
+
+    def route(self, user_input: str) -> Tuple[str, List[str], Dict]:
+        """
+        Main routing function - detects complexity and extracts intents
+        
+        Returns: (query_type, intents_list, slots)
+            query_type: "simple-query" or "complex-query" or "out_of_scope"
+            intents_list: List of intents to execute in order
+            slots: Extracted parameters
+        """
+        key, routed, query_vector = self._lookup(user_input)
+        if routed is not None:
+            return self._copy_route(routed)
+
+        llm_response = self._call_llm(self._build_prompt(user_input))
+        return self._remember(key, *self._parse_route(llm_response), query_vector)
+
+    async def route_async(self, user_input: str) -> Tuple[str, List[str], Dict]:
+        """route() for async callers; the LLM call doesn't block the event loop"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.route, user_input)
+
+        key, routed, query_vector = self._lookup(user_input)
+        if routed is not None:
+            return self._copy_route(routed)
+
+        llm_response = await self._call_llm_async(self._build_prompt(user_input))
+        return self._remember(key, *self._parse_route(llm_response), query_vector)
+
+    def _lookup(self, user_input: str) -> tuple:
+        """
+        Route without the LLM if possible
+
+        Returns: (cache key, route or None, query embedding or None)
+        """
+        key = " ".join(user_input.lower().split())
+
+        fast = self._fast_route(key)
+        if fast is not None:
+            return key, fast, None
+
+        query_vector = None
+        cached = self._cache_get(key)
+        if cached is None and self.semantic_cache:
+            query_vector = self._embed(key)
+            cached = self._semantic_get(query_vector)
+        return key, cached, query_vector
+
+    def _remember(self, key: str, routed: tuple, parsed: bool, query_vector) -> Tuple[str, List[str], Dict]:
+        """Cache an LLM route and return a copy for the caller"""
+        # A fallback route only reflects one bad reply; let the next ask retry
+        if parsed:
+            self._cache_put(key, routed)
+            if query_vector is not None:
+                self._semantic_put(key, query_vector)
+        return self._copy_route(routed)
+
+    def _parse_route(self, llm_response: str) -> Tuple[Tuple[str, List[str], Dict], bool]:
+        """
+        Turn the LLM's routing reply into (query_type, intents, slots)
+
+        Returns: (route, parsed) - parsed is False when the reply was unusable
+            and the general_query fallback was substituted
+        """
+        # Parse JSON response
+        result = self._extract_json(llm_response)
+        parsed = result is not None
+        if not parsed:
+            result = {'in_scope': True, 'intents': ['general_query'], 'slots': {}}
+
+        # Determine query type and return appropriate structure
+        if not result['in_scope']:
+            return ('out_of_scope', [], {}), parsed
+        
+        intents = result.get('intents', [])
+        slots = result.get('slots', {})
+        
+        # Determine if simple or complex based on number of intents
+        if len(intents) == 1:
+            return ('simple-query', intents, slots), parsed
+        else:
+            return ('complex-query', intents, slots), parsed
+
+    @staticmethod
+    def _fast_route(query: str) -> Optional[Tuple[str, List[str], Dict]]:
+        """Route common query shapes with regexes; None means ask the LLM"""
+        slots = {
+            "location": None,
+            "num_rooms": None,
+            "max_price": None,
+            "property_size_sqft": None,
+            "certificate_keywords": None
+        }
+
+        match = _FAST_SEARCH.match(query)
+        if match:
+            rooms, location, amount, unit = match.groups()
+            slots["num_rooms"] = int(rooms)
+            if location:
+                slots["location"] = location.strip(' .').title()
+            if amount:
+                try:
+                    multiplier = _PRICE_UNITS[unit.lower().rstrip('s')] if unit else 1
+                    slots["max_price"] = int(float(amount) * multiplier)
+                except ValueError:
+                    return None
+            return 'simple-query', ['search_property'], slots
+
+        match = _FAST_RENOVATION.match(query)
+        if match:
+            slots["property_size_sqft"] = int(match.group(1))
+            return 'simple-query', ['estimate_renovation'], slots
+
+        match = _FAST_RESEARCH.match(query)
+        if match:
+            slots["location"] = match.group(1).strip(' .').title()
+            return 'simple-query', ['web_research'], slots
+
+        return None
+
+    @staticmethod
+    def _copy_route(routed: tuple) -> Tuple[str, List[str], Dict]:
+        """Callers may mutate intents/slots, so never hand out cached objects"""
+        query_type, intents, slots = routed
+        return query_type, list(intents), dict(slots)
+
+    @staticmethod
+    def _cache_get(key: str) -> Optional[tuple]:
+        with _cache_lock:
+            routed = _ROUTE_CACHE.get(key)
+            if routed is not None:
+                _ROUTE_CACHE.move_to_end(key)
+            return routed
+
+    @staticmethod
+    def _cache_put(key: str, routed: tuple):
+        with _cache_lock:
+            _ROUTE_CACHE[key] = routed
+            _ROUTE_CACHE.move_to_end(key)
+            if len(_ROUTE_CACHE) > ROUTE_CACHE_SIZE:
+                _ROUTE_CACHE.popitem(last=False)
+
+    @staticmethod
+    def _embed(text: str) -> np.ndarray:
+        """Unit-length embedding from the RAG agent's (shared) model"""
+        from .rag_agent import _get_model
+        return _get_model().encode([text], convert_to_numpy=True,
+                                   normalize_embeddings=True)[0].astype('float32', copy=False)
+
+    def _semantic_get(self, query_vector: np.ndarray) -> Optional[tuple]:
+        """Cached route of the most similar earlier query, if close enough"""
+        with _cache_lock:
+            if _SEMANTIC_VECS is None:
+                return None
+            similarities = _SEMANTIC_VECS @ query_vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.semantic_threshold:
+                return None
+            return _ROUTE_CACHE.get(_SEMANTIC_KEYS[best])
+
+    @staticmethod
+    def _semantic_put(key: str, query_vector: np.ndarray):
+        global _SEMANTIC_VECS
+        with _cache_lock:
+            _SEMANTIC_KEYS.append(key)
+            rows = [query_vector] if _SEMANTIC_VECS is None else [_SEMANTIC_VECS, query_vector[None, :]]
+            _SEMANTIC_VECS = np.vstack(rows)[-ROUTE_CACHE_SIZE:]
+            del _SEMANTIC_KEYS[:-ROUTE_CACHE_SIZE]
+
+    def _build_prompt(self, user_query: str) -> str:
+        """Create the routing prompt for complexity detection and intent extraction"""
+        return _ROUTER_PROMPT_PREFIX + user_query + _ROUTER_PROMPT_SUFFIX
+
+    def _call_llm(self, prompt: str) -> str:
+        """
+        Call HuggingFace API using chat completions endpoint
 
-        payload = {
+        The reply is streamed and the connection dropped as soon as the first
+        JSON object closes; _extract_json never looks past it, so there is no
+        point waiting for (or paying for) whatever the model adds afterwards.
+        """
+        parts = []
+        scanner = _JsonEndScanner()
+
+        with self._session.post(self.api_url, headers=self._auth_headers, json=self._llm_payload(prompt),
+                                stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                content = _sse_content(line)
+                if content is _SSE_DONE:
+                    break
+                if content and self._collect(parts, scanner, content):
+                    break  # Leaving the with-block closes the connection
+
+        return ''.join(parts)
+
+    async def _call_llm_async(self, prompt: str) -> str:
+        """_call_llm over the event loop's shared httpx client"""
+        parts = []
+        scanner = _JsonEndScanner()
+
+        client = get_async_http_client()
+        async with client.stream("POST", self.api_url, headers=self._auth_headers,
+                                 json=self._llm_payload(prompt)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                content = _sse_content(line)
+                if content is _SSE_DONE:
+                    break
+                if content and self._collect(parts, scanner, content):
+                    break  # Leaving the with-block closes the connection
+
+        return ''.join(parts)
+
+    @staticmethod
+    def _collect(parts: list, scanner: "_JsonEndScanner", content: str) -> bool:
+        """Append streamed content up to the end of the JSON object; True once it closed"""
+        end = scanner.feed(content)
+        if end is not None:
+            parts.append(content[:end])
+            return True
+        parts.append(content)
+        return False
+
+    def _llm_payload(self, prompt: str) -> dict:
+        """Streaming chat completions request body"""
+        return {
             "messages": [
                 {
                     "role": "user",
@@ -129,82 +451,79 @@ Now analyze this query and return ONLY the JSON:"""
             ],
             "model": self.model,
             "max_tokens": 200,
-            "temperature": 0.1
+            "temperature": 0.1,
+            "stream": True
         }
 
-        response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
-
-    def _extract_json(self, text: str) -> Dict:
-        """Extract and validate JSON from LLM response"""
-        # Find JSON between { }
-        start = text.find('{')
-        end = text.rfind('}') + 1
+    def _extract_json(self, text: str) -> Optional[Dict]:
+        """Extract and validate JSON from LLM response; None if there is no usable JSON"""
+        # Find JSON between { } on the UTF-8 bytes (memchr-backed scans),
+        # which orjson / json.loads then parse without another conversion
+        raw = text.encode('utf-8')
+        start = raw.find(b'{')
+        end = raw.rfind(b'}') + 1
 
         if start == -1 or end == 0:
             # Fallback if no JSON found
             print(f"\nWarning: No JSON found in response")
             print(f"Raw LLM response: {text[:200]}")
-            return {'in_scope': True, 'intents': ['general_query'], 'slots': {}}
+            return None
 
-        json_str = text[start:end]
+        json_bytes = raw[start:end]
 
         try:
-            result = json.loads(json_str)
-            
+            result = _json_loads(json_bytes)
+            if not isinstance(result, dict):
+                print(f"\nWarning: LLM returned JSON that is not an object")
+                return None
+
             # Validate and clean the result
-            result = self._validate_and_clean(result)
-            
-            return result
+            return self._validate_and_clean(result)
             
         except json.JSONDecodeError as e:
             print(f"\nError: Failed to parse JSON")
             print(f"Raw LLM response: {text}")
-            print(f"Extracted JSON string: {json_str}")
+            print(f"Extracted JSON string: {json_bytes.decode('utf-8', 'replace')}")
             print(f"JSON Error: {e}")
-            # Fallback to general_query on JSON errors
-            return {'in_scope': True, 'intents': ['general_query'], 'slots': {}}
+            return None
     
-    def _validate_and_clean(self, result: Dict) -> Dict:
+    def _validate_and_clean(self, result: Dict) -> Optional[Dict]:
         """
         Validate and clean the parsed JSON result
         - Ensure intents is a list
         - Remove duplicate intents while preserving order
         - Validate intent names
+
+        Returns None for an in-scope reply without a single valid intent.
         """
+        if _validate_route is not None:
+            try:
+                return _validate_route(result)
+            except fastjsonschema.JsonSchemaException:
+                pass  # Repair below
+
         # Ensure intents exists and is a list
         if 'intents' not in result:
-            result['intents'] = ['general_query']
+            result['intents'] = []
         elif not isinstance(result['intents'], list):
             # If intents is a string, convert to list
             result['intents'] = [result['intents']]
         
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_intents = []
-        for intent in result['intents']:
-            if intent not in seen:
-                seen.add(intent)
-                unique_intents.append(intent)
-        
-        result['intents'] = unique_intents
-        
-        # Validate intent names (must be from allowed list)
-        allowed_intents = {
-            'search_property', 'estimate_renovation', 'generate_report',
-            'save_preference', 'web_research', 'general_query'
-        }
-        
-        validated_intents = [
+        # Keep allowed intent names only, dropping duplicates but keeping
+        # order, in one pass (dict keys are unique and insertion-ordered)
+        validated_intents = list(dict.fromkeys(
             intent for intent in result['intents']
-            if intent in allowed_intents
-        ]
+            if isinstance(intent, str) and intent in _ALLOWED_INTENT_SET
+        ))
         
-        # If no valid intents, default to general_query
+        # Ensure in_scope exists
+        if 'in_scope' not in result:
+            result['in_scope'] = True
+
+        # No valid intents: unusable unless the query is out of scope anyway
         if not validated_intents:
+            if result['in_scope']:
+                return None
             validated_intents = ['general_query']
         
         result['intents'] = validated_intents
@@ -213,8 +532,4 @@ Now analyze this query and return ONLY the JSON:"""
         if 'slots' not in result:
             result['slots'] = {}
         
-        # Ensure in_scope exists
-        if 'in_scope' not in result:
-            result['in_scope'] = True
-        
         return result
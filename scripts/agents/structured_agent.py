@@ -3,23 +3,144 @@ Structured Agent - SQL Query Executor
 Searches properties using PostgreSQL with filters
 """
 
-import os
-import psycopg2
-from dotenv import load_dotenv
+import re
+import math
+import asyncio
+from typing import Optional
+from functools import lru_cache
+from psycopg2.extras import RealDictCursor
+from .db import connection, get_async_pool, ASYNCPG_AVAILABLE
+from .config import get_config
+
+
+# Columns the search results are used for (chat listing and PDF report)
+SEARCH_COLUMNS = "property_id, location, num_rooms, property_size_sqft, price"
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+# Money amounts as the LLM tends to write them: 5000000, "50 lakh", "1.2 cr", "Rs. 80L"
+_AMOUNT = re.compile(
+    r"^\s*(?:rs\.?|inr|₹)?\s*(\d[\d,]*(?:\.\d+)?)\s*"
+    r"(k|thousand|l|lakhs?|lacs?|cr|crores?)?\s*$",
+    re.IGNORECASE
+)
+_AMOUNT_UNITS = {
+    'k': 1_000, 'thousand': 1_000,
+    'l': 100_000, 'lakh': 100_000, 'lakhs': 100_000, 'lac': 100_000, 'lacs': 100_000,
+    'cr': 10_000_000, 'crore': 10_000_000, 'crores': 10_000_000,
+}
+# Counts: 3, 3.0, "3", "3 BHK"
+_COUNT = re.compile(r"^\s*(\d+(?:\.0+)?)\s*(?:bhk|rooms?|bedrooms?)?\s*$", re.IGNORECASE)
+
+
+def _parse_amount(value) -> Optional[int]:
+    """Whole rupees/sqft from a numeric slot, or None if it can't be read"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        match = _AMOUNT.match(str(value))
+        if not match:
+            return None
+        unit = (match.group(2) or '').lower()
+        number = float(match.group(1).replace(',', '')) * _AMOUNT_UNITS.get(unit, 1)
+    if not math.isfinite(number) or number < 0:
+        return None
+    return round(number)
+
+
+def _parse_count(value) -> Optional[int]:
+    """A whole, non-negative count, or None (2.5 rooms is not truncated to 2)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() and value >= 0 else None
+    match = _COUNT.match(str(value))
+    return int(float(match.group(1))) if match else None
+
+
+# Supported filters: (filter key, SQL condition, parameter transform)
+FILTER_CLAUSES = (
+    ('location', "location ILIKE %s", lambda v: f"%{v}%"),
+    ('num_rooms', "num_rooms = %s", None),
+    ('max_price', "price <= %s", None),
+    ('min_price', "price >= %s", None),
+    ('property_size_sqft', "property_size_sqft >= %s", None),
+)
+
+# Numeric slots and their parsers. Values are normalised to ints up front,
+# since asyncpg, unlike psycopg2, won't cast strings for numeric columns.
+NUMERIC_FILTERS = {
+    'num_rooms': _parse_count,
+    'max_price': _parse_amount,
+    'min_price': _parse_amount,
+    'property_size_sqft': _parse_amount,
+    'limit': _parse_count,
+    'offset': _parse_count,
+}
+
+
+def normalize_filters(filters: dict) -> tuple:
+    """
+    Parse numeric slots once, dropping the ones that can't be read
+
+    Returns: (clean filters, {key: original value} of dropped slots)
+    """
+    clean = dict(filters)
+    dropped = {}
+    for key, parse in NUMERIC_FILTERS.items():
+        value = filters.get(key)
+        if value is None or value == '':
+            continue
+        parsed = parse(value)
+        if parsed is None:
+            dropped[key] = value
+            del clean[key]
+        else:
+            clean[key] = parsed
+    return clean, dropped
+
+
+# Query builder per filter shape (which filters are set); at most
+# 2**len(FILTER_CLAUSES) entries, each built on first use
+_QUERY_BUILDERS = {}
+
+
+def _make_query_builder(shape: tuple):
+    """Bake the SQL text and parameter getters for one filter shape"""
+    active = [clause for clause, present in zip(FILTER_CLAUSES, shape) if present]
+
+    query = f"SELECT {SEARCH_COLUMNS} FROM properties WHERE 1=1"
+    query += ''.join(f" AND {condition}" for _, condition, _ in active)
+    # Order by price, one page at a time
+    query += " ORDER BY price ASC LIMIT %s OFFSET %s"
+
+    getters = [(key, transform) for key, _, transform in active]
+
+    def build(filters: dict) -> tuple:
+        params = [transform(filters[key]) if transform else filters[key]
+                  for key, transform in getters]
+        params.append(min(filters.get('limit') or DEFAULT_LIMIT, MAX_LIMIT))
+        params.append(filters.get('offset') or 0)
+        return query, params
+
+    return build
+
+
+@lru_cache(maxsize=None)
+def _asyncpg_query(query: str) -> str:
+    """Rewrite psycopg2 %s placeholders as asyncpg's $1, $2, ..."""
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f"${next(counter)}", query)
 
 
 class StructuredAgent:
     """Executes SQL queries to search properties"""
 
     def __init__(self):
-        load_dotenv()
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', 5432),
-            'database': os.getenv('DB_NAME', 'realestate'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD')
-        }
+        self.db_config = get_config().db_config
 
     def search_properties(self, filters: dict) -> list:
         """
@@ -32,6 +153,8 @@ class StructuredAgent:
                 - max_price: int
                 - min_price: int
                 - property_size_sqft: int
+                - limit: int (page size, default 10)
+                - offset: int (rows to skip, default 0)
 
         Returns:
             List of property dictionaries
@@ -40,55 +163,33 @@ class StructuredAgent:
         # Build query
         query, params = self._build_query(filters)
 
-        # Execute
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+        # Execute on a pooled connection; RealDictCursor returns row dicts directly
+        with connection(self.db_config) as conn, \
+                conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
 
-        cursor.execute(query, params)
-        columns = [desc[0] for desc in cursor.description]
-        results = cursor.fetchall()
+    async def search_properties_async(self, filters: dict) -> list:
+        """search_properties() over asyncpg, without blocking the event loop"""
+        if not ASYNCPG_AVAILABLE:
+            return await asyncio.to_thread(self.search_properties, filters)
 
-        cursor.close()
-        conn.close()
+        query, params = self._build_query(filters)
 
-        # Convert to list of dicts
-        properties = []
-        for row in results:
-            properties.append(dict(zip(columns, row)))
+        pool = await get_async_pool(self.db_config)
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(_asyncpg_query(query), *params)
 
-        return properties
+        # Plain dicts, so results can be cached/serialized like psycopg2's
+        return [dict(row) for row in rows]
 
     def _build_query(self, filters: dict) -> tuple:
-        """Build SQL query with filters"""
-
-        query = "SELECT * FROM properties WHERE 1=1"
-        params = []
+        """Build SQL query with filters (unreadable numeric slots are ignored)"""
+        filters, _ = normalize_filters(filters)
+        shape = tuple(bool(filters.get(key)) for key, _, _ in FILTER_CLAUSES)
 
-        # Add location filter
-        if filters.get('location'):
-            query += " AND location ILIKE %s"
-            params.append(f"%{filters['location']}%")
+        builder = _QUERY_BUILDERS.get(shape)
+        if builder is None:
+            builder = _QUERY_BUILDERS[shape] = _make_query_builder(shape)
 
-        # Add room filter
-        if filters.get('num_rooms'):
-            query += " AND num_rooms = %s"
-            params.append(filters['num_rooms'])
-
-        # Add price filters
-        if filters.get('max_price'):
-            query += " AND price <= %s"
-            params.append(filters['max_price'])
-
-        if filters.get('min_price'):
-            query += " AND price >= %s"
-            params.append(filters['min_price'])
-
-        # Add size filter
-        if filters.get('property_size_sqft'):
-            query += " AND property_size_sqft >= %s"
-            params.append(filters['property_size_sqft'])
-
-        # Order by price
-        query += " ORDER BY price ASC LIMIT 10"
-
-        return query, params
+        return builder(filters)
@@ -3,18 +3,18 @@ Web Research Agent - Live Market Data
 Uses Tavily API for real-time market information
 """
 
-import os
-import requests
-from dotenv import load_dotenv
+import asyncio
+from .http_client import get_http_session, get_async_http_client, HTTPX_AVAILABLE
+from .config import get_config
 
 
 class WebResearchAgent:
     """Fetches live market data and neighborhood info"""
 
     def __init__(self):
-        load_dotenv()
-        self.tavily_api_key = os.getenv('TAVILY_API_KEY')
+        self.tavily_api_key = get_config().tavily_api_key
         self.tavily_url = "https://api.tavily.com/search"
+        self._session = get_http_session()
 
     def research(self, query: str) -> dict:
         """
@@ -31,43 +31,69 @@ class WebResearchAgent:
 
         try:
             # Call Tavily API
-            response = requests.post(
+            response = self._session.post(
                 self.tavily_url,
-                json={
-                    "api_key": self.tavily_api_key,
-                    "query": query,
-                    "search_depth": "basic",
-                    "max_results": 3
-                },
+                json=self._search_payload(query),
                 timeout=10
             )
+            return self._handle_response(query, response)
 
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "results": data.get('results', []),
-                    "summary": self._summarize_results(data.get('results', []))
-                }
-            else:
-                return self._fallback_response(query)
+        except Exception as e:
+            print(f"Tavily API error: {e}")
+            return self._fallback_response(query)
+
+    async def research_async(self, query: str) -> dict:
+        """research() for async callers, without blocking the event loop"""
+
+        if not self.tavily_api_key:
+            return self._fallback_response(query)
+
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.research, query)
+
+        try:
+            # Call Tavily API
+            response = await get_async_http_client().post(
+                self.tavily_url,
+                json=self._search_payload(query),
+                timeout=10
+            )
+            return self._handle_response(query, response)
 
         except Exception as e:
             print(f"Tavily API error: {e}")
             return self._fallback_response(query)
 
+    def _search_payload(self, query: str) -> dict:
+        """Tavily search request body"""
+        return {
+            "api_key": self.tavily_api_key,
+            "query": query,
+            "search_depth": "basic",
+            "max_results": 3
+        }
+
+    def _handle_response(self, query: str, response) -> dict:
+        """Turn a Tavily response (requests or httpx) into results + summary"""
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "results": data.get('results', []),
+                "summary": self._summarize_results(data.get('results', []))
+            }
+        else:
+            return self._fallback_response(query)
+
     def _summarize_results(self, results: list) -> str:
         """Create a summary from search results"""
 
         if not results:
             return "No recent market data found."
 
-        summary_parts = []
-        for i, result in enumerate(results[:3], 1):
-            summary_parts.append(
-                f"{i}. {result.get('title', 'N/A')}: {result.get('content', 'N/A')[:200]}..."
-            )
-
-        return '\n\n'.join(summary_parts)
+        return '\n\n'.join(
+            f"{i}. {result.get('title', 'N/A')}: {result.get('content', 'N/A')[:200]}..."
+            for i, result in enumerate(results[:3], 1)
+        )
 
     def _fallback_response(self, query: str) -> dict:
         """Fallback when Tavily is not available"""
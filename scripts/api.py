@@ -5,12 +5,14 @@ Provides REST API for Excel ingestion and chatbot
 
 import os
 import shutil
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from dotenv import load_dotenv
+from cachetools import LRUCache
 
 # Import existing components
 import sys
@@ -21,16 +23,85 @@ scripts_dir = Path(__file__).parent
 sys.path.insert(0, str(scripts_dir))
 
 from etl import step1_read_excel, step2_save_to_postgres, step3_extract_pdf_text, step4_index_vectors
-from chat import RealEstateChatbot
+from chat import RealEstateChatbot, build_shared_agents
+from agents.memory import AsyncMemory
+from agents.config import get_config
+from agents.rag_agent import RAGAgent, reset_shared_index, clear_property_cache
+
+# Load environment variables (once, shared with the agents)
+config = get_config()
+
+# Chatbot per user, least recently used evicted first. Chatbots only hold
+# the user's memory; the agents themselves are shared (see get_shared_agents)
+chatbots = LRUCache(maxsize=int(os.getenv('CHATBOT_CACHE_SIZE', 200)))
+
+# Stateless agents shared by every chatbot, built at startup (see lifespan)
+# or, if that failed, on first chat
+_shared_agents = {}
+
+
+def get_shared_agents() -> dict:
+    """Build the shared agents once (needs the FAISS index to exist)"""
+    if not _shared_agents:
+        _shared_agents.update(build_shared_agents())
+    return _shared_agents
+
+
+def _reload_rag_agent():
+    """Drop the old index and cached rows; RAGAgent on the new index if agents are live (blocking)"""
+    reset_shared_index()
+    clear_property_cache()
+    return RAGAgent() if _shared_agents else None
+
+
+async def refresh_rag_agent():
+    """Point the shared agents and live chatbots at the re-built FAISS index"""
+    rag_agent = await asyncio.get_running_loop().run_in_executor(None, _reload_rag_agent)
+    if rag_agent is not None:
+        _shared_agents['rag_agent'] = rag_agent
+        for chatbot in chatbots.values():
+            chatbot.rag_agent = rag_agent
+
+
+# One ETL run at a time: each run rewrites the same index files
+_ingest_lock = asyncio.Lock()
+
+
+def run_etl(file_path: str) -> int:
+    """Run the 4 ETL steps on an uploaded file (blocking); returns properties ingested"""
+    # Step 1: Read Excel
+    df = step1_read_excel(file_path)
+
+    # Step 2: Save to PostgreSQL
+    count = step2_save_to_postgres(df, DB_CONFIG)
+
+    # Step 3: Extract PDF text
+    cert_dir = "assets/certificates"
+    pdf_texts = step3_extract_pdf_text(cert_dir)
+
+    # Step 4: Index vectors
+    step4_index_vectors(df, pdf_texts, DB_CONFIG)
+    return count
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the shared agents (embedding model, FAISS index) before serving"""
+    try:
+        get_shared_agents()
+        print("Shared agents loaded")
+    except Exception as e:
+        # e.g. no FAISS index before the first ingest; retried on first chat
+        print(f"Warning: could not pre-load agents: {e}")
+    yield
 
-# Load environment variables
-load_dotenv()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="SmartSense API",
     description="Real Estate Search Engine with Multi-Agent Chatbot",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for Streamlit
@@ -49,16 +120,7 @@ UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 # Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', 5432),
-    'database': os.getenv('DB_NAME', 'realestate'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD')
-}
-
-# Store chatbot instances per user
-chatbots = {}
+DB_CONFIG = config.db_config
 
 
 # Request/Response Models
@@ -124,20 +186,11 @@ async def ingest_excel(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
-    # Run ETL pipeline
+    # Run ETL pipeline in a worker thread so chats keep being served meanwhile
     try:
-        # Step 1: Read Excel
-        df = step1_read_excel(str(file_path))
-
-        # Step 2: Save to PostgreSQL
-        count = step2_save_to_postgres(df, DB_CONFIG)
-
-        # Step 3: Extract PDF text
-        cert_dir = "assets/certificates"
-        pdf_texts = step3_extract_pdf_text(cert_dir)
-
-        # Step 4: Index vectors
-        step4_index_vectors(df, pdf_texts, DB_CONFIG)
+        async with _ingest_lock:
+            count = await asyncio.get_running_loop().run_in_executor(None, run_etl, str(file_path))
+            await refresh_rag_agent()
 
         # Clean up uploaded file
         file_path.unlink()
@@ -167,7 +220,10 @@ async def chat(request: ChatRequest):
     # Get or create chatbot for this user
     if request.user_id not in chatbots:
         try:
-            chatbots[request.user_id] = RealEstateChatbot(user_id=request.user_id)
+            chatbots[request.user_id] = RealEstateChatbot(
+                user_id=request.user_id,
+                agents=get_shared_agents()
+            )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to initialize chatbot: {str(e)}")
 
@@ -175,7 +231,7 @@ async def chat(request: ChatRequest):
 
     # Process message
     try:
-        response_text = chatbot.chat(request.message)
+        response_text = await chatbot.chat(request.message)
 
         # Try to extract intent from debug output (if available)
         # The chatbot prints [DEBUG] Intent: ... which we can't capture here
@@ -210,9 +266,9 @@ async def get_preferences(user_id: str):
         prefs = chatbots[user_id].memory.get_all_preferences()
         return {"preferences": prefs}
     else:
-        # Create temporary chatbot to fetch preferences
-        temp_chatbot = RealEstateChatbot(user_id=user_id)
-        prefs = temp_chatbot.memory.get_all_preferences()
+        # No active session: read long-term memory directly instead of
+        # spinning up a whole chatbot
+        prefs = await AsyncMemory(user_id).get_all_preferences()
         return {"preferences": prefs}
 
 
@@ -4,9 +4,13 @@ Orchestrates all agents for the real estate chatbot
 """
 
 import sys
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from agents.router import QueryRouter
 from agents.planner import Planner
-from agents.structured_agent import StructuredAgent
+from agents.structured_agent import StructuredAgent, normalize_filters
 from agents.rag_agent import RAGAgent
 from agents.web_research import WebResearchAgent
 from agents.report_generator import ReportGenerator
@@ -14,30 +18,66 @@ from agents.renovation import RenovationEstimator
 from agents.memory import Memory
 
 
+# Runs the blocking (DB, RAG, memory) handlers off the event loop
+_TASK_POOL = ThreadPoolExecutor(max_workers=8)
+
+# One search result line: fields pulled in a single call, bound format method
+_LISTING_FIELDS = itemgetter('property_id', 'location', 'num_rooms', 'property_size_sqft', 'price')
+_LISTING_LINE = "- {}: {} - {} BHK, {} sqft - Rs.{:,}".format
+
+
+def build_shared_agents() -> dict:
+    """
+    Build the agents that hold no per-user state, for sharing across chatbots
+
+    Returns: dict to pass as RealEstateChatbot(user_id, agents=...)
+    """
+    return {
+        'router': QueryRouter(),
+        'planner': Planner(),
+        'structured_agent': StructuredAgent(),
+        'rag_agent': RAGAgent(),
+        'web_agent': WebResearchAgent(),
+        'report_generator': ReportGenerator(),
+        'renovation_estimator': RenovationEstimator(),
+    }
+
+
 class RealEstateChatbot:
     """Main chatbot that coordinates all agents"""
 
-    def __init__(self, user_id: str = 'default_user'):
+    def __init__(self, user_id: str = 'default_user', agents: dict = None):
+        """
+        Args:
+            user_id: Owner of this chatbot's memory
+            agents: Optional pre-built agents to share between chatbots, keyed
+                like the attributes below (see build_shared_agents). Only
+                memory is per-user; missing agents are created here.
+        """
         print("Initializing Real Estate Chatbot...")
 
-        # Initialize all agents
-        self.router = QueryRouter()
-        self.planner = Planner()
-        self.structured_agent = StructuredAgent()
-        self.rag_agent = RAGAgent()
-        self.web_agent = WebResearchAgent()
-        self.report_generator = ReportGenerator()
-        self.renovation_estimator = RenovationEstimator()
+        # Initialize all agents (or reuse shared ones)
+        agents = agents or {}
+        self.router = agents.get('router') or QueryRouter()
+        self.planner = agents.get('planner') or Planner()
+        self.structured_agent = agents.get('structured_agent') or StructuredAgent()
+        self.rag_agent = agents.get('rag_agent') or RAGAgent()
+        self.web_agent = agents.get('web_agent') or WebResearchAgent()
+        self.report_generator = agents.get('report_generator') or ReportGenerator()
+        self.renovation_estimator = agents.get('renovation_estimator') or RenovationEstimator()
 
         # Initialize memory
         self.memory = Memory(user_id)
 
         print("Chatbot ready!\n")
 
-    def chat(self, user_input: str) -> str:
+    async def chat(self, user_input: str) -> str:
         """
         Main chat function with Router → Planner → Agent(s) flow
 
+        Async so the API's event loop keeps serving other requests while
+        this one waits on the LLM, Tavily or the database.
+
         Args:
             user_input: User's message
 
@@ -49,7 +89,7 @@ class RealEstateChatbot:
         self.memory.add_message('user', user_input)
 
         # Step 1: Route the query (detect complexity + extract intents + slots)
-        query_type, intents, slots = self.router.route(user_input)
+        query_type, intents, slots = await self.router.route_async(user_input)
 
         print(f"[DEBUG] Query Type: {query_type}")
         print(f"[DEBUG] Intents: {intents}")
@@ -65,10 +105,10 @@ class RealEstateChatbot:
             response = "I can only help with real estate queries. Please ask about properties, prices, or renovations."
         elif query_type == 'simple-query':
             # Single agent execution
-            response = self._execute_task(tasks[0], user_input)
+            response = await self._execute_task(tasks[0], user_input)
         elif query_type == 'complex-query':
             # Multi-agent execution
-            response = self._execute_complex_tasks(tasks, user_input)
+            response = await self._execute_complex_tasks(tasks, user_input)
         else:
             response = "I'm not sure how to help with that. Try asking about property search or renovation estimates."
 
@@ -77,7 +117,7 @@ class RealEstateChatbot:
 
         return response
 
-    def _execute_task(self, task: dict, user_input: str) -> str:
+    async def _execute_task(self, task: dict, user_input: str) -> str:
         """
         Execute a single task
         
@@ -90,25 +130,34 @@ class RealEstateChatbot:
         """
         agent = task['agent']
         params = task['params']
-        
+
+        if agent == 'web_research':
+            return await self._handle_web_research(user_input)
         if agent == 'search_property':
-            return self._handle_search(params)
-        elif agent == 'estimate_renovation':
+            return await self._handle_search(params)
+        if agent == 'generate_report':
+            return await self._handle_report(params)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_TASK_POOL, self._execute_blocking_task, agent, params, user_input)
+
+    def _execute_blocking_task(self, agent: str, params: dict, user_input: str) -> str:
+        """Run a handler that blocks (DB / embedding / LLM / PDF); called in a worker thread"""
+        if agent == 'estimate_renovation':
             return self._handle_renovation(params)
-        elif agent == 'generate_report':
-            return self._handle_report(params)
         elif agent == 'save_preference':
             return self._handle_save_preference(params, user_input)
-        elif agent == 'web_research':
-            return self._handle_web_research(user_input)
         elif agent == 'general_query':
             return self._handle_general_query(user_input, params)
         else:
             return "I'm not sure how to help with that."
     
-    def _execute_complex_tasks(self, tasks: list, user_input: str) -> str:
+    async def _execute_complex_tasks(self, tasks: list, user_input: str) -> str:
         """
-        Execute multiple tasks in sequence and combine responses
+        Execute multiple tasks and combine responses
+
+        Tasks sharing a planner group have no data dependency, so each group
+        runs concurrently; groups run in order.
         
         Args:
             tasks: List of task dictionaries
@@ -117,14 +166,32 @@ class RealEstateChatbot:
         Returns:
             Combined response from all agents
         """
+        results = [None] * len(tasks)
+
+        # Identical (agent, params) tasks in one turn run once; the key is
+        # JSON so unhashable slot values (lists, dicts) are fine
+        keys = [(task['agent'], json.dumps(task['params'], sort_keys=True, default=str)) for task in tasks]
+        first_index = {}
+        for i, key in enumerate(keys):
+            first_index.setdefault(key, i)
+
+        for group in sorted({task.get('group', 0) for task in tasks}):
+            batch = [(i, task) for i, task in enumerate(tasks)
+                     if task.get('group', 0) == group and first_index[keys[i]] == i]
+
+            for i, task in batch:
+                print(f"[DEBUG] Executing task {i+1}/{len(tasks)}: {task['agent']} (group {group})")
+
+            responses = await asyncio.gather(*(self._execute_task(task, user_input) for _, task in batch))
+            for (i, _), response in zip(batch, responses):
+                results[i] = response
+
+        for i, key in enumerate(keys):
+            results[i] = results[first_index[key]]
+
+        # Add task header for clarity in multi-step responses
         responses = []
-        
-        for i, task in enumerate(tasks):
-            print(f"[DEBUG] Executing task {i+1}/{len(tasks)}: {task['agent']}")
-            
-            response = self._execute_task(task, user_input)
-            
-            # Add task header for clarity in multi-step responses
+        for task, response in zip(tasks, results):
             agent_name = task['agent'].replace('_', ' ').title()
             responses.append(f"**{agent_name}:**\n{response}")
         
@@ -134,25 +201,33 @@ class RealEstateChatbot:
         return combined_response
 
 
-    def _handle_search(self, slots: dict) -> str:
+    async def _handle_search(self, slots: dict) -> str:
         """Handle property search"""
-        properties = self.structured_agent.search_properties(slots)
+        # Unreadable numeric slots (e.g. max_price="affordable") are dropped, not fatal
+        filters, dropped = normalize_filters(slots)
+        note = ""
+        if dropped:
+            ignored = ", ".join(f"{key}={value!r}" for key, value in dropped.items())
+            note = f"(Ignored filters I couldn't understand: {ignored})\n\n"
+
+        properties = await self.structured_agent.search_properties_async(filters)
 
         if not properties:
-            return f"No properties found matching your criteria: {slots}"
+            return f"{note}No properties found matching your criteria: {filters}"
+
+        # Format response (show up to 10 properties)
+        lines = [f"Found {len(properties)} properties:", ""]
+        lines.extend(_LISTING_LINE(*_LISTING_FIELDS(prop)) for prop in properties[:10])
 
-        # Format response
-        response = f"Found {len(properties)} properties:\n\n"
-        for prop in properties[:10]:  # Show up to 10 properties
-            response += f"- {prop['property_id']}: {prop['location']} - "
-            response += f"{prop['num_rooms']} BHK, {prop['property_size_sqft']} sqft - "
-            response += f"Rs.{prop['price']:,}\n"
+        response = note + "\n".join(lines) + "\n"
 
         if len(properties) > 10:
             response += f"\n... and {len(properties) - 10} more properties"
 
-        # Save last search to short-term memory (save all properties, not just IDs)
-        self.memory.set_context('last_search_results', properties)
+        # Save last search to short-term memory (save all properties, not just IDs);
+        # the Redis client is sync, so write from the task pool
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_TASK_POOL, self.memory.set_context, 'last_search_results', properties)
 
         return response
 
@@ -165,10 +240,11 @@ class RealEstateChatbot:
 
         return self.renovation_estimator.format_estimate(costs)
 
-    def _handle_report(self, slots: dict) -> str:
+    async def _handle_report(self, slots: dict) -> str:
         """Generate PDF report"""
-        # Get last search results from short-term memory
-        properties = self.memory.get_context('last_search_results')
+        # Get last search results from short-term memory (sync Redis, so off the loop)
+        loop = asyncio.get_running_loop()
+        properties = await loop.run_in_executor(_TASK_POOL, self.memory.get_context, 'last_search_results')
 
         if not properties:
             return "No recent property searches found. Please search for properties first."
@@ -180,27 +256,30 @@ class RealEstateChatbot:
             return "Could not generate report. Please search for properties first."
 
         # Generate report
-        pdf_path = self.report_generator.generate_report(properties)
+        pdf_path = await self.report_generator.generate_report_async(properties)
 
         return f"Report generated successfully! Saved to: {pdf_path}"
 
     def _handle_save_preference(self, slots: dict, user_input: str) -> str:
         """Save user preferences"""
-        # Save to long-term memory
+        # Save to long-term memory (single batched write)
+        prefs = {}
         if slots.get('max_price'):
-            self.memory.save_preference('budget', str(slots['max_price']))
+            prefs['budget'] = str(slots['max_price'])
 
         if slots.get('location'):
-            self.memory.save_preference('preferred_location', slots['location'])
+            prefs['preferred_location'] = slots['location']
 
         if slots.get('num_rooms'):
-            self.memory.save_preference('preferred_rooms', str(slots['num_rooms']))
+            prefs['preferred_rooms'] = str(slots['num_rooms'])
+
+        self.memory.save_preferences(prefs)
 
         return "Preferences saved! I'll remember them for future searches."
 
-    def _handle_web_research(self, user_input: str) -> str:
+    async def _handle_web_research(self, user_input: str) -> str:
         """Handle market research queries"""
-        result = self.web_agent.research(user_input)
+        result = await self.web_agent.research_async(user_input)
         return result['summary']
 
     def _handle_general_query(self, user_input: str, params: dict = None) -> str:
@@ -226,6 +305,10 @@ class RealEstateChatbot:
 
 def main():
     """Run interactive chatbot"""
+    asyncio.run(_main())
+
+
+async def _main():
     print("=" * 60)
     print("     Real Estate Chatbot - Phase 2")
     print("=" * 60)
@@ -260,7 +343,7 @@ def main():
             continue
 
         # Get response
-        response = chatbot.chat(user_input)
+        response = await chatbot.chat(user_input)
         print(f"\nBot: {response}")
 
 
@@ -7,29 +7,67 @@ Steps:
 4. Index everything to vector database with embeddings
 """
 
+import io
 import os
+import json
+import multiprocessing
 import pandas as pd
 import psycopg2
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
-# PDF text extraction
+# Embedding model shared with the API's RAG agent: one copy per process, and
+# catalog and queries are encoded on the same device/backend
+from agents.rag_agent import EMBEDDING_MODEL, _get_model
+
+# PDF text extraction (in-process, or in worker processes for large sets)
+from pdf_text import extract_one, PDF_AVAILABLE
+
+# Content hash for the embedding cache (blake3 is faster when installed)
 try:
-    import pdfplumber
+    from blake3 import blake3 as _HASH
 except ImportError:
-    pdfplumber = None
+    from hashlib import blake2b as _HASH
 
 # Vector database - using FAISS (simple, no server needed)
 import faiss
 import numpy as np
 VECTOR_DB = 'faiss'
 
+# IVF-PQ settings: 256 coarse cells, 32 sub-quantizers of 8 bits each
+# (32-byte codes for 384-d vectors). FAISS wants ~39 training
+# points per centroid, PQ codebooks included, so smaller catalogs stay on
+# exhaustive search (over 8-bit scalar-quantized vectors) where a linear
+# scan is cheap anyway.
+IVF_NLIST = 256
+PQ_M = 32
+PQ_NBITS = 8
+IVF_NPROBE = 8
+IVF_MIN_VECTORS = 39 * max(IVF_NLIST, 2 ** PQ_NBITS)
+
+# Worker processes for PDF text extraction. Spawned workers re-import the
+# main script (for `python scripts/etl.py`: pandas, FAISS, torch), which
+# costs seconds each, so small certificate sets are extracted in-process.
+PDF_WORKERS = 8
+PDF_PROCESS_MIN_FILES = 64
+
+# Sheet columns embedded for each property (certificate PDF text is appended)
+EMBED_TEXT_COLUMNS = ['title_short_description', 'long_description', 'location', 'metadata_tags']
+
+# Texts per forward pass when embedding the catalog
+EMBED_BATCH_SIZE = 64
+
 
 def step1_read_excel(file_path):
     """Step 1: Read Excel file"""
     print(f"\n=== STEP 1: Reading Excel file ===")
-    df = pd.read_excel(file_path)
+    try:
+        # Rust-backed reader; much faster than openpyxl on large sheets
+        df = pd.read_excel(file_path, engine='calamine')
+    except (ImportError, ValueError):
+        # python-calamine missing (or pandas < 2.2): default engine
+        df = pd.read_excel(file_path)
 
     # Rename the column with special characters
     if 'title / short_description' in df.columns:
@@ -40,43 +78,108 @@ def step1_read_excel(file_path):
     return df
 
 
+# Canonical columns as loaded by step 2, in COPY order
+INT_COLUMNS = ['num_rooms', 'property_size_sqft', 'price']
+TEXT_COLUMNS = ['title_short_description', 'long_description', 'location',
+                'seller_type', 'certificates', 'seller_contact', 'metadata_tags']
+STAGE_COLUMNS = ['seq', 'property_id', 'num_rooms', 'property_size_sqft',
+                 'title_short_description', 'long_description', 'location',
+                 'price', 'seller_type', 'listing_date',
+                 'certificates', 'seller_contact', 'metadata_tags']
+
+
+def _stage_frame(df):
+    """Coerce the sheet into the staging table layout, whole columns at a time"""
+    # Missing columns default to 0 / ''; unparseable numbers become 0
+    ints = (df.reindex(columns=INT_COLUMNS)
+              .apply(pd.to_numeric, errors='coerce')
+              .fillna(0)
+              .astype('int64'))
+    texts = df.reindex(columns=TEXT_COLUMNS, fill_value='').fillna('').astype(str)
+    listing_date = pd.to_datetime(df['listing_date'], errors='coerce') if 'listing_date' in df else pd.NaT
+
+    stage = pd.concat([ints, texts], axis=1)
+    stage['seq'] = range(len(df))
+    stage['property_id'] = df['property_id']
+    stage['listing_date'] = listing_date
+    return stage[STAGE_COLUMNS]
+
+
 def step2_save_to_postgres(df, db_config):
     """Step 2: Save canonical data to PostgreSQL"""
     print(f"\n=== STEP 2: Saving to PostgreSQL ===")
 
+    buf = io.StringIO()
+    _stage_frame(df).to_csv(buf, index=False, header=False, na_rep='')
+    buf.seek(0)
+
     # Connect to database
     conn = psycopg2.connect(**db_config)
     cursor = conn.cursor()
 
-    # Insert each row
-    count = 0
-    for _, row in df.iterrows():
-        cursor.execute("""
-            INSERT INTO properties (
-                property_id, num_rooms, property_size_sqft,
-                title_short_description, long_description, location,
-                price, seller_type, listing_date,
-                certificates, seller_contact, metadata_tags
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (property_id) DO UPDATE SET
-                num_rooms = EXCLUDED.num_rooms,
-                price = EXCLUDED.price,
-                location = EXCLUDED.location
-        """, (
-            row['property_id'],
-            int(row.get('num_rooms', 0)),
-            int(row.get('property_size_sqft', 0)),
-            str(row.get('title_short_description', '')),
-            str(row.get('long_description', '')),
-            str(row.get('location', '')),
-            int(row.get('price', 0)),
-            str(row.get('seller_type', '')),
-            pd.to_datetime(row.get('listing_date'), errors='coerce'),
-            str(row.get('certificates', '')),
-            str(row.get('seller_contact', '')),
-            str(row.get('metadata_tags', ''))
-        ))
-        count += 1
+    # Stream all rows in with one COPY, then upsert them in a single statement
+    cursor.execute("""
+        CREATE TEMP TABLE properties_stage (
+            seq INTEGER,
+            property_id VARCHAR(50),
+            num_rooms INTEGER,
+            property_size_sqft INTEGER,
+            title_short_description TEXT,
+            long_description TEXT,
+            location TEXT,
+            price BIGINT,
+            seller_type VARCHAR(50),
+            listing_date TIMESTAMP,
+            certificates TEXT,
+            seller_contact TEXT,
+            metadata_tags TEXT
+        ) ON COMMIT DROP
+    """)
+    # FORCE_NOT_NULL keeps empty text cells as '' rather than NULL;
+    # an empty listing_date still loads as NULL
+    cursor.copy_expert(f"""
+        COPY properties_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN
+        WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(TEXT_COLUMNS)}))
+    """, buf)
+    # certificates_display and format_certificates() come from migration 002;
+    # without them (e.g. after re-running 001) load the raw column only
+    cursor.execute("""
+        SELECT to_regprocedure('format_certificates(text)') IS NOT NULL
+           AND EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'properties' AND column_name = 'certificates_display')
+    """)
+    if cursor.fetchone()[0]:
+        display_column = ", certificates_display"
+        display_value = ", format_certificates(certificates)"
+        display_update = ",\n            certificates_display = EXCLUDED.certificates_display"
+    else:
+        print("certificates_display missing, run migrations/002_certificates_display.sql")
+        display_column = display_value = display_update = ""
+
+    # DISTINCT ON keeps the last sheet row per property_id, as the row-by-row upsert did
+    cursor.execute(f"""
+        INSERT INTO properties (
+            property_id, num_rooms, property_size_sqft,
+            title_short_description, long_description, location,
+            price, seller_type, listing_date,
+            certificates{display_column},
+            seller_contact, metadata_tags
+        )
+        SELECT DISTINCT ON (property_id)
+            property_id, num_rooms, property_size_sqft,
+            title_short_description, long_description, location,
+            price, seller_type, listing_date,
+            certificates{display_value},
+            seller_contact, metadata_tags
+        FROM properties_stage
+        ORDER BY property_id, seq DESC
+        ON CONFLICT (property_id) DO UPDATE SET
+            num_rooms = EXCLUDED.num_rooms,
+            price = EXCLUDED.price,
+            location = EXCLUDED.location,
+            certificates = EXCLUDED.certificates{display_update}
+    """)
+    count = len(df)
 
     conn.commit()
     cursor.close()
@@ -90,8 +193,8 @@ def step3_extract_pdf_text(cert_dir):
     """Step 3: Extract text from PDF certificates"""
     print(f"\n=== STEP 3: Extracting PDF text ===")
 
-    if not pdfplumber:
-        print("WARNING: pdfplumber not installed, skipping PDF extraction")
+    if not PDF_AVAILABLE:
+        print("WARNING: neither pymupdf nor pdfplumber installed, skipping PDF extraction")
         return {}
 
     cert_path = Path(cert_dir)
@@ -101,66 +204,159 @@ def step3_extract_pdf_text(cert_dir):
         print(f"WARNING: Certificate directory {cert_dir} not found")
         return {}
 
-    for pdf_file in cert_path.glob('*.pdf'):
-        try:
-            with pdfplumber.open(pdf_file) as pdf:
-                text = '\n'.join([page.extract_text() or '' for page in pdf.pages])
-                pdf_texts[pdf_file.name] = text
-                print(f"Extracted {len(text)} chars from {pdf_file.name}")
-        except Exception as e:
-            print(f"ERROR: Failed to extract {pdf_file.name}: {e}")
+    pdf_files = [str(p) for p in cert_path.glob('*.pdf')]
+    if len(pdf_files) < PDF_PROCESS_MIN_FILES:
+        results = list(map(extract_one, pdf_files))
+    else:
+        # PDF parsing is CPU-bound, so large sets are spread over processes.
+        # Workers are spawned, not forked: the API runs this step too, and a
+        # forked child would inherit its model/FAISS threads and DB/Redis sockets.
+        workers = min(os.cpu_count() or 1, PDF_WORKERS, len(pdf_files))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(extract_one, pdf_files))
+
+    for name, text, error in results:
+        if error is not None:
+            print(f"ERROR: Failed to extract {name}: {error}")
+            continue
+        pdf_texts[name] = text
+        print(f"Extracted {len(text)} chars from {name}")
 
     print(f"Extracted text from {len(pdf_texts)} PDFs")
     return pdf_texts
 
 
+def build_faiss_index(vectors):
+    """Build an inner-product FAISS index sized to the catalog"""
+    dimension = vectors.shape[1]
+
+    if len(vectors) < IVF_MIN_VECTORS:
+        # Exhaustive scan over int8 codes: 4x less memory to read than float32.
+        # Training only records per-dimension ranges, so any catalog size works.
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit,
+                                           faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    else:
+        # Sub-linear search: probe a few IVF cells of PQ-compressed vectors
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, IVF_NLIST, PQ_M, PQ_NBITS,
+                                 faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = IVF_NPROBE
+
+    index.add(vectors)
+    return index
+
+
+def index_meta(index) -> dict:
+    """Layout of a built index, saved next to it for the search side"""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        nlist, nprobe = ivf.nlist, ivf.nprobe
+    except RuntimeError:
+        nlist, nprobe = None, None  # exhaustive index
+    return {'dim': index.d, 'ntotal': index.ntotal, 'nlist': nlist, 'nprobe': nprobe}
+
+
+def _text_hash(text: str) -> str:
+    return _HASH(text.encode('utf-8')).hexdigest()
+
+
+def _embed_with_cache(model, texts, cache_path):
+    """
+    Embed texts, re-using vectors of unchanged texts from the last run
+
+    The cache maps a content hash of each text to its vector and is only
+    valid for the model/backend recorded in it. It is rewritten with just
+    the current catalog, so it never grows past one vector per property.
+    """
+    model_key = "|".join([
+        EMBEDDING_MODEL,
+        os.getenv('EMBEDDING_BACKEND', 'torch'),
+        os.getenv('EMBEDDING_MODEL_FILE', ''),
+        str(model.max_seq_length)
+    ])
+    cache = {}
+    try:
+        with np.load(cache_path, allow_pickle=False) as saved:
+            if str(saved['model']) == model_key:
+                cache = dict(zip(saved['hashes'].tolist(), saved['vectors']))
+    except Exception:
+        pass  # No usable cache yet: embed everything
+
+    hashes = [_text_hash(text) for text in texts]
+    missing = {h: text for h, text in zip(hashes, texts) if h not in cache}
+    print(f"Embedding {len(missing)} new/changed texts ({len(texts) - len(missing)} cached)")
+
+    if missing:
+        # Encode in batches; unit-length output, so inner product is cosine similarity
+        new_vectors = model.encode(
+            list(missing.values()),
+            batch_size=EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        cache.update(zip(missing.keys(), new_vectors))
+
+    # Fill one preallocated float32 matrix instead of stacking then converting
+    vectors = np.empty((len(hashes), model.get_sentence_embedding_dimension()), dtype='float32')
+    for row, h in enumerate(hashes):
+        vectors[row] = cache[h]
+
+    # Save one row per distinct text (duplicate listings share a vector)
+    first_row = {}
+    for row, h in enumerate(hashes):
+        first_row.setdefault(h, row)
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        cache_path,
+        model=np.array(model_key),
+        hashes=np.array(list(first_row)),
+        vectors=vectors[list(first_row.values())]
+    )
+    return vectors
+
+
 def step4_index_vectors(df, pdf_texts, vector_config):
     """Step 4: Create embeddings and index to vector database"""
     print(f"\n=== STEP 4: Indexing to vector database (FAISS) ===")
 
     # Load embedding model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    model = _get_model()
     print("Loaded embedding model")
 
-    # Create FAISS index
-    dimension = 384
-    index = faiss.IndexFlatIP(dimension)
-
-    vectors = []
-    id_map = []
+    # Combine all text per property, a column at a time
+    fields = df.reindex(columns=EMBED_TEXT_COLUMNS, fill_value='').fillna('').astype(str)
+    combined = fields[EMBED_TEXT_COLUMNS[0]].str.cat(
+        [fields[col] for col in EMBED_TEXT_COLUMNS[1:]], sep=' '
+    )
 
-    for idx, row in df.iterrows():
-        # Combine all text for this property
-        text_parts = [
-            row.get('title_short_description', ''),
-            row.get('long_description', ''),
-            row.get('location', ''),
-            row.get('metadata_tags', '')
-        ]
+    # Add certificate text if available
+    if pdf_texts and 'certificates' in df:
+        cert_text = df['certificates'].fillna('').astype(str).str.split('|').map(
+            lambda certs: ' '.join(pdf_texts[c] for c in map(str.strip, certs) if c in pdf_texts)
+        )
+        combined = combined.where(cert_text == '', combined + ' ' + cert_text)
 
-        # Add certificate text if available
-        certs = str(row.get('certificates', '')).split('|')
-        for cert in certs:
-            cert = cert.strip()
-            if cert in pdf_texts:
-                text_parts.append(pdf_texts[cert])
+    texts = combined.tolist()
+    id_map = df['property_id'].astype(str).tolist()
 
-        combined_text = ' '.join(text_parts)
-        embedding = model.encode(combined_text)
-
-        vectors.append(embedding)
-        id_map.append(row['property_id'])
+    vectors = _embed_with_cache(model, texts, 'data/faiss_index/embed_cache.npz')
 
     # Add to FAISS
-    vectors = np.array(vectors, dtype='float32')
-    faiss.normalize_L2(vectors)
-    index.add(vectors)
+    index = build_faiss_index(vectors)
 
     # Save to disk
     Path('data/faiss_index').mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, 'data/faiss_index/properties.index')
+    # Write then rename: a running API may have the old file memory-mapped,
+    # and truncating it in place would pull pages out from under searches
+    faiss.write_index(index, 'data/faiss_index/properties.index.tmp')
+    os.replace('data/faiss_index/properties.index.tmp', 'data/faiss_index/properties.index')
     with open('data/faiss_index/id_map.txt', 'w') as f:
         f.write('\n'.join(id_map))
+    with open('data/faiss_index/index_meta.json', 'w') as f:
+        json.dump(index_meta(index), f)
 
     print(f"Indexed {len(vectors)} properties to FAISS")
     print(f"Saved index to data/faiss_index/")
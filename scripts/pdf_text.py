@@ -0,0 +1,36 @@
+"""
+PDF Text Extraction
+Used by ETL step 3, in-process or as the worker function of its process
+pool. Spawned workers still re-import the parent's main script, so this
+module does not keep pandas, FAISS or the model out of them.
+"""
+
+from pathlib import Path
+
+# PyMuPDF (native, much faster) with pdfplumber as fallback
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+PDF_AVAILABLE = bool(pymupdf or pdfplumber)
+
+
+def extract_one(path: str) -> tuple:
+    """Extract one PDF: (file name, text, error)"""
+    name = Path(path).name
+    try:
+        if pymupdf:
+            with pymupdf.open(path) as doc:
+                text = '\n'.join([page.get_text() for page in doc])
+        else:
+            with pdfplumber.open(path) as pdf:
+                text = '\n'.join([page.extract_text() or '' for page in pdf.pages])
+        return name, text, None
+    except Exception as e:
+        return name, None, str(e)
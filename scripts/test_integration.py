@@ -4,16 +4,14 @@ Tests the chatbot programmatically without interactive input
 """
 
 import sys
-from chat import RealEstateChatbot
+import asyncio
+from chat import RealEstateChatbot, build_shared_agents
 
-def test_chatbot():
+async def test_chatbot():
     print("=" * 60)
     print("Testing Real Estate Chatbot Integration")
     print("=" * 60)
 
-    # Initialize chatbot
-    chatbot = RealEstateChatbot(user_id='test_user_integration')
-
     # Test cases covering different intents
     test_queries = [
         "Find 2BHK apartments in Mumbai under 50 lakh",
@@ -23,21 +21,34 @@ def test_chatbot():
         "Estimate renovation cost for 1200 sqft apartment",
     ]
 
+    # One chatbot per query so conversation histories don't interleave;
+    # the stateless agents (and their connections) are shared
+    agents = build_shared_agents()
+    chatbots = [
+        RealEstateChatbot(user_id=f'test_user_integration_{i}', agents=agents)
+        for i in range(1, len(test_queries) + 1)
+    ]
+
     print("\nRunning tests...\n")
 
-    for i, query in enumerate(test_queries, 1):
+    # Queries are I/O-bound on the LLM and database, so run them concurrently
+    responses = await asyncio.gather(
+        *(chatbot.chat(query) for chatbot, query in zip(chatbots, test_queries)),
+        return_exceptions=True
+    )
+
+    for i, (query, response) in enumerate(zip(test_queries, responses), 1):
         print(f"\nTest {i}: {query}")
         print("-" * 60)
 
-        try:
-            response = chatbot.chat(query)
+        if isinstance(response, Exception):
+            print(f"Status: FAILED")
+            print(f"Error: {response}")
+        else:
             # Fix encoding for Windows
             response_clean = response.encode('ascii', 'ignore').decode('ascii')
             print(f"Response: {response_clean[:500]}...")
             print("Status: PASSED")
-        except Exception as e:
-            print(f"Status: FAILED")
-            print(f"Error: {e}")
 
         print("-" * 60)
 
@@ -46,4 +57,4 @@ def test_chatbot():
     print("=" * 60)
 
 if __name__ == '__main__':
-    test_chatbot()
+    asyncio.run(test_chatbot())
@@ -3,58 +3,72 @@ Quick test script for Phase 3 integration
 Tests both FastAPI endpoints
 """
 
-import requests
+import asyncio
+import httpx
 
 API_BASE = "http://localhost:8000"
 
-def test_health():
+# The checks run concurrently, so each prints its section only after its
+# response arrives; the sections never interleave.
+
+async def test_health(client: httpx.AsyncClient):
     """Test health endpoint"""
+    response = await client.get("/api/health")
     print("\n=== Testing Health Endpoint ===")
-    response = requests.get(f"{API_BASE}/api/health")
     print(f"Status: {response.status_code}")
     print(f"Response: {response.json()}")
     return response.status_code == 200
 
-def test_chat():
+async def test_chat(client: httpx.AsyncClient):
     """Test chat endpoint"""
-    print("\n=== Testing Chat Endpoint ===")
     payload = {
         "user_id": "test_user_phase3",
         "message": "Show me 3 bedroom properties"
     }
-    response = requests.post(f"{API_BASE}/api/chat", json=payload)
+    response = await client.post("/api/chat", json=payload)
+    print("\n=== Testing Chat Endpoint ===")
     print(f"Status: {response.status_code}")
     result = response.json()
     print(f"Response preview: {result['response'][:150]}...")
     return response.status_code == 200
 
-def test_root():
+async def test_root(client: httpx.AsyncClient):
     """Test root endpoint"""
+    response = await client.get("/")
     print("\n=== Testing Root Endpoint ===")
-    response = requests.get(f"{API_BASE}/")
     print(f"Status: {response.status_code}")
     print(f"Response: {response.json()}")
     return response.status_code == 200
 
-if __name__ == "__main__":
-    print("=" * 60)
-    print("Phase 3 Integration Test")
-    print("=" * 60)
-
+async def run_tests():
+    """Run every check at once over one pooled client"""
     tests = [
         ("Root Endpoint", test_root),
         ("Health Check", test_health),
         ("Chat API", test_chat)
     ]
 
+    async with httpx.AsyncClient(base_url=API_BASE, timeout=60) as client:
+        outcomes = await asyncio.gather(
+            *(test_func(client) for _, test_func in tests),
+            return_exceptions=True
+        )
+
     results = []
-    for name, test_func in tests:
-        try:
-            success = test_func()
-            results.append((name, "PASSED" if success else "FAILED"))
-        except Exception as e:
-            print(f"ERROR: {e}")
+    for (name, _), outcome in zip(tests, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"ERROR ({name}): {outcome}")
             results.append((name, "ERROR"))
+        else:
+            results.append((name, "PASSED" if outcome else "FAILED"))
+    return results
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Phase 3 Integration Test")
+    print("=" * 60)
+
+    results = asyncio.run(run_tests())
 
     print("\n" + "=" * 60)
     print("Test Results:")
@@ -5,8 +5,10 @@ Upload properties and chat with the bot on one page
 
 import streamlit as st
 from pathlib import Path
-import html
-from utils import upload_excel, check_api_health, send_chat_message, clear_chat_history, get_preferences
+from utils import (
+    upload_excel, send_chat_message, clear_chat_history,
+    check_api_health_cached, get_preferences_cached, list_reports, read_report
+)
 
 # Page configuration
 st.set_page_config(
@@ -16,62 +18,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 0.5rem;
-    }
-    .sub-header {
-        font-size: 1.1rem;
-        color: #666;
-        text-align: center;
-        margin-bottom: 1.5rem;
-    }
-    .success-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        color: #155724;
-    }
-    .error-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        color: #721c24;
-    }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-        border-left: 4px solid #1976d2;
-        color: #000000;
-    }
-    .bot-message {
-        background-color: #f5f5f5;
-        border-left: 4px solid #4caf50;
-        color: #000000;
-    }
-    .intent-badge {
-        display: inline-block;
-        padding: 0.25rem 0.75rem;
-        border-radius: 1rem;
-        background-color: #fff3cd;
-        color: #856404;
-        font-size: 0.85rem;
-        margin-top: 0.5rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS (read from disk once per server process)
+@st.cache_resource
+def load_css() -> str:
+    return (Path(__file__).parent / "static" / "styles.css").read_text()
+
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 # Initialize session state
 if "messages" not in st.session_state:
@@ -83,13 +35,10 @@ if "user_id" not in st.session_state:
 if "data_uploaded" not in st.session_state:
     st.session_state.data_uploaded = False
 
-if "message_input" not in st.session_state:
-    st.session_state.message_input = ""
-
 # Sidebar
 with st.sidebar:
     # API Status
-    api_status = check_api_health()
+    api_status = check_api_health_cached()
     if api_status:
         st.success("✅ API Connected")
     else:
@@ -102,19 +51,22 @@ with st.sidebar:
     st.markdown("### 📊 Generated Reports")
     reports_dir = Path("reports")
     if reports_dir.exists():
-        report_files = sorted(reports_dir.glob("*.pdf"), key=lambda x: x.stat().st_mtime, reverse=True)
+        report_files = list_reports(str(reports_dir))
         
         if report_files:
             st.caption(f"Found {len(report_files)} report(s)")
-            for report in report_files[:10]:  # Show last 10 reports
-                with open(report, "rb") as f:
-                    st.download_button(
-                        label=f"📄 {report.name}",
-                        data=f,
-                        file_name=report.name,
-                        mime="application/pdf",
-                        key=f"download_{report.name}"
-                    )
+            for name, mtime in report_files[:10]:  # Show last 10 reports
+                try:
+                    data = read_report(str(reports_dir), name, mtime)
+                except OSError:
+                    continue  # Deleted or replaced since the listing was cached
+                st.download_button(
+                    label=f"📄 {name}",
+                    data=data,
+                    file_name=name,
+                    mime="application/pdf",
+                    key=f"download_{name}"
+                )
         else:
             st.caption("No reports generated yet")
     else:
@@ -124,7 +76,7 @@ with st.sidebar:
     
     # Saved Preferences
     st.markdown("### 💾 Saved Preferences")
-    prefs_result = get_preferences(st.session_state.user_id)
+    prefs_result = get_preferences_cached(st.session_state.user_id)
     preferences = prefs_result.get("preferences", {})
     
     if preferences:
@@ -138,6 +90,7 @@ with st.sidebar:
     # Clear conversation button
     if st.button("🗑️ Clear Conversation", width="stretch"):
         result = clear_chat_history(st.session_state.user_id)
+        get_preferences_cached.clear()
         st.session_state.messages = []
         st.success("Conversation cleared!")
         st.rerun()
@@ -169,6 +122,7 @@ if uploaded_file is not None:
                     
                     # Upload and process
                     result = upload_excel(uploaded_file)
+                    st.cache_data.clear()
                     
                     progress_text.empty()
                 
@@ -203,92 +157,59 @@ st.markdown("---")
 if st.session_state.data_uploaded:
     st.markdown("## 💬 Chat with SmartSense")
 
-    # Display chat messages
-    chat_container = st.container()
+    def render_message(message):
+        role = "user" if message["role"] == "user" else "assistant"
+        with st.chat_message(role):
+            st.markdown(message["content"])
+            if message.get("sources"):
+                st.caption(f"**Sources:** {', '.join(message['sources'])}")
+            if message.get("intent"):
+                st.caption(f"Intent: {message['intent']}")
 
-    with chat_container:
-        if not st.session_state.messages:
-            st.info("""
-            👋 **Welcome! I can help you with:**
-            - 🔍 Search for properties (e.g., "Find 2BHK in Mumbai under 50 lakh")
-            - 💰 Estimate renovation costs (e.g., "Estimate renovation for 1200 sqft")
-            - 📊 Generate comparison reports
-            - 💾 Save your preferences
-            - 🌐 Get current market rates
-            """)
+    # Display chat messages
+    if not st.session_state.messages:
+        st.info("""
+        👋 **Welcome! I can help you with:**
+        - 🔍 Search for properties (e.g., "Find 2BHK in Mumbai under 50 lakh")
+        - 💰 Estimate renovation costs (e.g., "Estimate renovation for 1200 sqft")
+        - 📊 Generate comparison reports
+        - 💾 Save your preferences
+        - 🌐 Get current market rates
+        """)
+
+    for message in st.session_state.messages:
+        render_message(message)
+
+    # Chat input (Enter sends)
+    user_input = st.chat_input("Ask me about properties, prices, renovations...")
+
+    if user_input and user_input.strip():
+        if not api_status:
+            st.error("❌ API is not running. Please start the backend first.")
         else:
-            for message in st.session_state.messages:
-                if message["role"] == "user":
-                    escaped_content = html.escape(message["content"])
-                    st.markdown(f"""
-                    <div class="chat-message user-message">
-                        <strong>You:</strong><br>
-                        {escaped_content}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    intent_badge = ""
-                    if message.get("intent"):
-                        intent_badge = f'<span class="intent-badge">Intent: {message["intent"]}</span>'
-                    
-                    sources_text = ""
-                    if message.get("sources"):
-                        sources_list = ', '.join(message['sources'])
-                        sources_text = f"<br><small><strong>Sources:</strong> {sources_list}</small>"
-                    
-                    escaped_content = html.escape(message["content"]).replace('\n', '<br>')
-                    
-                    st.markdown(f"""
-                    <div class="chat-message bot-message">
-                        <strong>Bot:</strong><br>
-                        {escaped_content}
-                        {sources_text}
-                        {intent_badge}
-                    </div>
-                    """, unsafe_allow_html=True)
+            # Add user message
+            user_message = {"role": "user", "content": user_input}
+            st.session_state.messages.append(user_message)
+            render_message(user_message)
 
-    # Chat input with Enter key support
-    def send_message():
-        user_input = st.session_state.message_input
-        
-        if user_input and user_input.strip():
-            if not api_status:
-                st.error("❌ API is not running. Please start the backend first.")
-            else:
-                # Add user message
-                st.session_state.messages.append({
-                    "role": "user",
-                    "content": user_input
-                })
-                
-                # Get bot response
+            # Get bot response
+            with st.spinner("Thinking..."):
                 response = send_chat_message(st.session_state.user_id, user_input)
-                
-                # Add bot response
-                st.session_state.messages.append({
-                    "role": "bot",
-                    "content": response.get("response", "No response"),
-                    "intent": response.get("intent"),
-                    "sources": response.get("sources")
-                })
-                
-                # Clear input
-                st.session_state.message_input = ""
-
-    col1, col2 = st.columns([5, 1])
-
-    with col1:
-        st.text_input(
-            "Type your message and press Enter...",
-            key="message_input",
-            placeholder="Ask me about properties, prices, renovations...",
-            label_visibility="collapsed",
-            on_change=send_message
-        )
-
-    with col2:
-        if st.button("Send 📤", type="primary", width="stretch"):
-            send_message()
+            # The message may have saved a preference or generated a report
+            get_preferences_cached.clear()
+            list_reports.clear()
+
+            # Add bot response
+            bot_message = {
+                "role": "bot",
+                "content": response.get("response", "No response"),
+                "intent": response.get("intent"),
+                "sources": response.get("sources")
+            }
+            st.session_state.messages.append(bot_message)
+
+            # Rerun so the sidebar preferences and footer count include this turn
+            st.rerun()
 else:
     # Show message when chatbot is not yet available
     st.markdown("## 💬 Chat with SmartSense")
@@ -5,7 +5,19 @@ API client helpers
 
 import requests
 import os
+from pathlib import Path
+import streamlit as st
 from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from requests_toolbelt import MultipartEncoder
+    TOOLBELT_AVAILABLE = True
+except ImportError:
+    TOOLBELT_AVAILABLE = False
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 # API configuration
 # Prefer API_BASE_URL if set, otherwise build from API_HOST and API_PORT
@@ -15,6 +27,18 @@ if not API_BASE_URL:
     API_PORT = os.getenv("API_PORT", "8000")
     API_BASE_URL = f"http://{API_HOST}:{API_PORT}"
 
+# One keep-alive session for every API call from this Streamlit process.
+# Retries cover transient 5xx on idempotent requests only (GET/DELETE),
+# so chat messages and uploads are never sent twice.
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
 
 def upload_excel(file) -> dict:
     """
@@ -28,10 +52,15 @@ def upload_excel(file) -> dict:
     """
     url = f"{API_BASE_URL}/api/ingest"
 
-    files = {"file": (file.name, file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
-
     try:
-        response = requests.post(url, files=files, timeout=300)  # 5 min timeout for ETL
+        if TOOLBELT_AVAILABLE:
+            # Stream the multipart body from the file instead of building it in memory
+            encoder = MultipartEncoder(fields={"file": (file.name, file, XLSX_MIME)})
+            response = _SESSION.post(url, data=encoder, headers={"Content-Type": encoder.content_type},
+                                     timeout=300)  # 5 min timeout for ETL
+        else:
+            files = {"file": (file.name, file, XLSX_MIME)}
+            response = _SESSION.post(url, files=files, timeout=300)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -57,7 +86,7 @@ def send_chat_message(user_id: str, message: str) -> dict:
     }
 
     try:
-        response = requests.post(url, json=payload, timeout=60)
+        response = _SESSION.post(url, json=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -77,7 +106,7 @@ def clear_chat_history(user_id: str) -> dict:
     url = f"{API_BASE_URL}/api/chat/{user_id}/history"
 
     try:
-        response = requests.delete(url, timeout=10)
+        response = _SESSION.delete(url, timeout=10)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -97,7 +126,7 @@ def get_preferences(user_id: str) -> dict:
     url = f"{API_BASE_URL}/api/chat/{user_id}/preferences"
 
     try:
-        response = requests.get(url, timeout=10)
+        response = _SESSION.get(url, timeout=10)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -114,7 +143,40 @@ def check_api_health() -> bool:
     url = f"{API_BASE_URL}/api/health"
 
     try:
-        response = requests.get(url, timeout=5)
+        response = _SESSION.get(url, timeout=5)
         return response.status_code == 200
     except:
         return False
+
+
+# Streamlit reruns the whole script on every interaction, so the sidebar
+# lookups are cached briefly instead of hitting the API on each rerun.
+# Callers clear them after actions that change the result.
+@st.cache_data(ttl=5, show_spinner=False)
+def check_api_health_cached() -> bool:
+    """check_api_health(), cached for 5 seconds"""
+    return check_api_health()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_preferences_cached(user_id: str) -> dict:
+    """get_preferences(), cached per user for 30 seconds"""
+    return get_preferences(user_id)
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def list_reports(reports_dir: str) -> list:
+    """(name, mtime) of each PDF report, newest first, cached for 10 seconds"""
+    path = Path(reports_dir)
+    if not path.exists():
+        return []
+    reports = ((f.name, f.stat().st_mtime) for f in path.glob("*.pdf"))
+    return sorted(reports, key=lambda report: report[1], reverse=True)
+
+
+# cache_resource hands back the same bytes object on every rerun, where
+# cache_data would unpickle a fresh copy of each PDF each time
+@st.cache_resource(max_entries=10, show_spinner=False)
+def read_report(reports_dir: str, name: str, mtime: float) -> bytes:
+    """Report bytes; mtime is part of the cache key so a rewritten file is re-read"""
+    return (Path(reports_dir) / name).read_bytes()